@@ -1,7 +1,16 @@
+"""Streamlit front end. Scheduling runs in a separate service, which must be started first:
+
+    python scheduling_service.py
+    streamlit run app.py
+
+Set SCHEDULER_SERVICE_URL when the service listens somewhere other than http://127.0.0.1:8765.
+"""
 import streamlit as st
-from course_scheduler import CourseScheduler
+import scheduling_client
+from course_scheduler import SchedulePager
+from schedule_batch import stress_levels
 from weekly_calendar import initialize_calendar_state, create_calendar, add_schedule_to_calendar, calculate_stress_level, display_stress_meter
-import os
+from tracing import start_trace, stop_trace
 
 st.set_page_config(layout="wide")
 
@@ -11,22 +20,66 @@ st.title("Course Scheduler")
 if 'step' not in st.session_state:
     st.session_state['step'] = 1
 
-if 'scheduler' not in st.session_state:
-    st.session_state['scheduler'] = None
+if 'still_needed' not in st.session_state:
+    st.session_state['still_needed'] = []
 
 if 'schedules' not in st.session_state:
     st.session_state['schedules'] = []
 
+# Sections kept in every schedule (CRN -> course code) and course codes left out, edited in Step 3
+if 'locked' not in st.session_state:
+    st.session_state['locked'] = {}
+
+if 'excluded' not in st.session_state:
+    st.session_state['excluded'] = []
+
 initialize_calendar_state()
 
+def solve_first_page():
+    """Start paging through schedules for the current credits and edits; the service reuses its earlier work"""
+    pager = SchedulePager(scheduling_client.iter_schedules(
+        st.session_state['still_needed'], st.session_state['desired_credits'],
+        locked=list(st.session_state['locked']), excluded=st.session_state['excluded'],
+        exclude_full=st.session_state.get('exclude_full', False), term=st.session_state.get('term')))
+    st.session_state['schedule_pager'] = pager
+    try:
+        st.session_state['schedules'] = pager.next_page()
+    except scheduling_client.ServiceError as e:
+        if e.reason == 'unknown_crn' and (st.session_state['locked'] or st.session_state['excluded']):
+            # A kept section can leave the catalog when it is refreshed; start over without the edits.
+            # Other failures (a timeout, the service down) keep the edits for the next try
+            clear_edits()
+            st.session_state['notice'] = f"{e}. Kept sections and left out courses were cleared."
+            solve_first_page()
+            return
+        st.error(str(e))
+        st.stop()
+
+def clear_edits():
+    st.session_state['locked'] = {}
+    st.session_state['excluded'] = []
+
+# Optional debug panel: stage timings kept across reruns of this session. Requests to the scheduling
+# service are traced too (service_call), and their spans recorded in the service (pdf_extract,
+# section_resolve, solve with its node counts, ...) are added after them
+show_timings = st.sidebar.checkbox("Show debug timings")
+if show_timings:
+    start_trace(st.session_state.setdefault('debug_spans', []))
+else:
+    stop_trace()
+
 # Step 1: Upload DegreeWorks PDF
 if st.session_state['step'] == 1:
     st.header("Step 1: Upload Your DegreeWorks PDF")
     uploaded_file = st.file_uploader("Choose a file", type="pdf")
     if uploaded_file is not None:
-        with open("temp_degreeworks.pdf", "wb") as f:
-            f.write(uploaded_file.getvalue())
-        st.session_state['scheduler'] = CourseScheduler("temp_degreeworks.pdf")
+        # The scheduling service parses the upload's bytes; repeat uploads come from its parse cache
+        try:
+            st.session_state['still_needed'] = scheduling_client.parse_still_needed(uploaded_file.getvalue())
+            clear_edits()
+        except scheduling_client.ServiceError as e:
+            st.error(str(e))
+            st.stop()
         st.session_state['step'] = 2
         st.success("PDF uploaded successfully!")
         st.rerun()
@@ -34,11 +87,28 @@ if st.session_state['step'] == 1:
 # Step 2: Select credit hours
 elif st.session_state['step'] == 2:
     st.header("Step 2: Select Desired Credit Hours")
+    try:
+        terms = scheduling_client.terms()
+    except scheduling_client.ServiceError as e:
+        st.error(str(e))
+        st.stop()
+    # Latest term first, as that is the one students usually plan
+    term_codes = sorted(terms, reverse=True)
+    current = st.session_state.get('term')
+    term = st.selectbox("Term", term_codes, index=term_codes.index(current) if current in term_codes else 0,
+                        format_func=lambda code: terms[code] or code)
+    if term != current:
+        # Locked CRNs belong to the sections of one term
+        st.session_state['locked'] = {}
+    st.session_state['term'] = term
     credit_hours = st.selectbox("How many credit hours do you want to take?", [12, 15, 18])
     st.session_state['desired_credits'] = credit_hours
+    st.session_state['exclude_full'] = st.checkbox("Only include sections with open seats",
+                                                   value=st.session_state.get('exclude_full', False))
     if st.button("Generate Schedules"):
         with st.spinner("Generating schedules..."):
-            st.session_state['schedules'] = st.session_state['scheduler'].generate_schedules(desired_credits=credit_hours)
+            # Later pages are only requested from the service when the student asks for them in Step 3
+            solve_first_page()
         st.success(f"Generated {len(st.session_state['schedules'])} schedules")
         st.session_state['step'] = 3
         st.rerun()
@@ -46,12 +116,15 @@ elif st.session_state['step'] == 2:
 # Step 3: Display remaining courses and select a schedule
 elif st.session_state['step'] == 3:
     st.header("Step 3: Review and Select a Schedule")
+    notice = st.session_state.pop('notice', None)
+    if notice:
+        st.warning(notice)
     
     col1, col2 = st.columns([1, 2])
     
     with col1:
         st.subheader("Remaining Courses")
-        for course in st.session_state['scheduler'].still_needed_courses:
+        for course in st.session_state['still_needed']:
             if isinstance(course, str):
                 st.write(f"• {course}")
             elif isinstance(course, dict) and course["type"] == "options":
@@ -62,11 +135,21 @@ elif st.session_state['step'] == 3:
         num_schedules = len(st.session_state['schedules'])
         
         if num_schedules > 0:
+            pager = st.session_state['schedule_pager']
+            stress = stress_levels(st.session_state['schedules'])
             selected_schedule = st.selectbox(
                 "Select a schedule to view details:",
                 range(1, num_schedules + 1),
-                format_func=lambda x: f"Schedule {x}"
+                format_func=lambda x: f"Schedule {pager.first_index + x} ({stress[x - 1]:.0f}% stress)",
+                key=f"schedule_page_{pager.page_number}"
             )
+            if st.button("Next schedules →", disabled=pager.exhausted):
+                try:
+                    st.session_state['schedules'] = pager.next_page()
+                except scheduling_client.ServiceError as e:
+                    st.error(str(e))
+                    st.stop()
+                st.rerun()
             
             schedule = st.session_state['schedules'][selected_schedule - 1]
             st.session_state['selected_schedule'] = selected_schedule - 1  # Store the selected schedule index
@@ -75,8 +158,51 @@ elif st.session_state['step'] == 3:
             st.write(f"**Total Credits:** {total_credits}")
             for course in schedule:
                 st.write(f"**{course.subject} {course.course_number}:** {course.title}")
-                st.write(f"  Credits: {course.credit_hours}, Days: {course.days}, Time: {course.begin_time}-{course.end_time}")
+                meets = "; ".join(f"{days} {begin_time}-{end_time}" for days, begin_time, end_time, _, _
+                                  in dict.fromkeys(course.meetings) if days) or "Online"
+                st.write(f"  Credits: {course.credit_hours}, Meets: {meets}")
+
+            # Editing these re-solves from the service's session for this audit instead of from scratch
+            code_of = dict(st.session_state['locked'])
+            code_of.update((course.crn, course.subject + course.course_number) for course in schedule)
+            locked = st.multiselect("Keep these sections in every schedule", list(code_of),
+                                    default=list(st.session_state['locked']),
+                                    format_func=lambda crn: f"{code_of[crn]} (CRN {crn})")
+            codes = [code for entry in st.session_state['still_needed']
+                     for code in ([entry] if isinstance(entry, str) else entry.get('courses', []))]
+            excluded = st.multiselect("Leave out these courses", list(dict.fromkeys(codes)),
+                                      default=st.session_state['excluded'])
+            with st.form("keep_crn", clear_on_submit=True):
+                crn = st.text_input("Keep another section by CRN").strip()
+                keep = st.form_submit_button("Keep section")
+            if keep and crn:
+                try:
+                    found = scheduling_client.find_sections(st.session_state.get('term'), crn=crn)
+                except scheduling_client.ServiceError as e:
+                    st.error(str(e))
+                    st.stop()
+                code = found[0].subject + found[0].course_number if found else None
+                if code in codes:
+                    code_of[crn] = code
+                    locked.append(crn)
+                else:
+                    st.warning(f"CRN {crn} is not a section of a remaining course this term")
+            # A section of a course that is left out cannot be kept
+            locked = {crn: code_of[crn] for crn in locked if code_of[crn] not in excluded}
+            if locked != st.session_state['locked'] or excluded != st.session_state['excluded']:
+                st.session_state['locked'] = locked
+                st.session_state['excluded'] = excluded
+                with st.spinner("Updating schedules..."):
+                    solve_first_page()
+                st.rerun()
             
+            if (st.session_state['locked'] or st.session_state['excluded']) and st.button(
+                    "Clear kept sections and left out courses"):
+                clear_edits()
+                with st.spinner("Updating schedules..."):
+                    solve_first_page()
+                st.rerun()
+
             if st.button("Add to Calendar"):
                 try:
                     add_schedule_to_calendar(schedule)
@@ -88,8 +214,13 @@ elif st.session_state['step'] == 3:
         else:
             st.warning("No valid schedules could be generated. Please try adjusting your criteria or check your course data.")
             st.write("Debug information:")
-            st.write(f"Total available courses: {len(st.session_state['scheduler'].available_courses)}")
+            st.write(f"Still needed entries: {len(st.session_state['still_needed'])}")
             st.write(f"Desired credits: {st.session_state.get('desired_credits', 'Not set')}")
+            if st.session_state['locked'] or st.session_state['excluded']:
+                if st.button("Clear kept sections and left out courses"):
+                    clear_edits()
+                    solve_first_page()
+                    st.rerun()
             if st.button("Go Back"):
                 st.session_state['step'] = 2
                 st.rerun()
@@ -112,6 +243,10 @@ elif st.session_state['step'] == 4:
         selected_schedule = st.session_state['schedules'][st.session_state.get('selected_schedule', 0)]
         display_stress_meter(selected_schedule, 'week')  # Default to week view
 
-# Clean up temporary file
-if os.path.exists("temp_degreeworks.pdf"):
-    os.remove("temp_degreeworks.pdf")
+if show_timings:
+    with st.sidebar:
+        st.subheader("Stage timings")
+        if st.button("Clear timings"):
+            st.session_state['debug_spans'].clear()
+        # Most recent first
+        st.dataframe(list(reversed(st.session_state['debug_spans'][-100:])))
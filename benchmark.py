@@ -0,0 +1,237 @@
+"""Offline benchmarks for every stage, on all_courses and on synthetic catalogs.
+
+    python benchmark.py [--sizes 2000 10000] [--repeat 3] [--seed 0] [--output results.json]
+
+all_courses is the fixed baseline; synthetic Banner pages and still-needed
+texts are generated from the seed, so the same arguments always measure the
+same work. Each stage reports its best and median wall time and its peak
+traced memory.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from catalog import Catalog
+from catalog_snapshot import page_files
+from course_scheduler import CourseScheduler
+from data_preprocessing import iter_course_rows, load_course_data
+from schedule_batch import ScheduleBatch
+from still_needed_courses_parser import parse_still_needed_courses
+from tracing import start_trace, stop_trace
+
+SUBJECTS = ('ACCT', 'BIOL', 'CHEM', 'COMM', 'ECON', 'ENGL', 'HIST', 'ITSC', 'MATH', 'PHIL', 'PHYS', 'PSYC',
+            'SOCY', 'STAT')
+DAY_FIELDS = (('M', 'monday'), ('T', 'tuesday'), ('W', 'wednesday'), ('R', 'thursday'), ('F', 'friday'),
+              ('S', 'saturday'), ('U', 'sunday'))
+# (days, beginTime, endTime) of the weekly patterns synthetic sections are drawn from; None is asynchronous online
+MEETING_PATTERNS = (
+    [('MWF', f"{hour:02d}00", f"{hour:02d}50") for hour in range(8, 16)] +
+    [('TR', f"{hour:02d}{minute:02d}", f"{hour + 1:02d}{minute + 15:02d}")
+     for hour, minute in ((8, 0), (9, 30), (11, 0), (12, 30), (14, 0), (15, 30))] +
+    [('MW', '1600', '1715'), ('M', '1800', '2045'), ('T', '1800', '2045'), ('W', '1800', '2045'), None])
+TERM_DATES = (('01/13/2025', '05/08/2025'),) * 8 + (('01/13/2025', '03/07/2025'), ('03/17/2025', '05/08/2025'))
+BUILDINGS = ('WOODW', 'FRIDY', 'CHHS', 'BURSN', 'COED', 'DENNY', 'KENN', 'CARY')
+# Still-needed sets: (single courses, "choose N" groups, options per group, N)
+REQUIREMENT_SETS = {'small': (6, 1, 3, 1), 'medium': (9, 2, 4, 1), 'large': (12, 3, 5, 2)}
+PAGE_SIZE = 500
+# Candidate schedules scored together by the batch_score stage
+BATCH_SCHEDULES = 500
+
+
+def _meeting(crn: str, pattern, dates: Tuple[str, str], rng: random.Random) -> Dict:
+    days, begin_time, end_time = pattern or ('', None, None)
+    meeting_time = {name: day in days for day, name in DAY_FIELDS}
+    meeting_time.update({
+        'beginTime': begin_time, 'endTime': end_time, 'startDate': dates[0], 'endDate': dates[1],
+        'building': rng.choice(BUILDINGS) if pattern else 'ONLINE', 'room': str(rng.randint(100, 499)),
+        'campus': 'M', 'campusDescription': 'Main Campus', 'courseReferenceNumber': crn,
+        'meetingType': 'CLAS', 'hoursWeek': 0.0})
+    return {'courseReferenceNumber': crn, 'faculty': [], 'meetingTime': meeting_time}
+
+
+def synthetic_section(rng: random.Random, crn: int, subject: str, number: str, credits: int,
+                      link_identifier: str = None) -> Dict:
+    """One Banner searchResults record with the fields the ingest reads"""
+    crn = str(crn)
+    pattern = rng.choice(MEETING_PATTERNS)
+    meetings = [_meeting(crn, pattern, rng.choice(TERM_DATES), rng)]
+    if pattern and rng.random() < 0.07:
+        # A second meeting, as with a weekly lab or a mid-term room change
+        meetings.append(_meeting(crn, rng.choice(MEETING_PATTERNS[:-1]), rng.choice(TERM_DATES), rng))
+    banner_id = str(rng.randint(100000, 100000 + 40 * len(SUBJECTS)))
+    return {
+        'term': '202510', 'courseReferenceNumber': crn, 'subject': subject, 'courseNumber': number,
+        'subjectCourse': subject + number, 'courseTitle': f"{subject} Topics {number}",
+        'creditHours': credits, 'creditHourLow': credits, 'campusDescription': 'Main Campus',
+        'instructionalMethod': 'TR' if pattern else 'IA', 'isSectionLinked': link_identifier is not None,
+        'linkIdentifier': link_identifier, 'openSection': True, 'meetingsFaculty': meetings,
+        'faculty': [{'bannerId': banner_id, 'displayName': f"Instructor {banner_id}", 'primaryIndicator': True}],
+    }
+
+
+def write_synthetic_pages(directory: str, sections: int, seed: int = 0) -> List[str]:
+    """Write about ``sections`` records as classes_*.json pages and return their course codes.
+
+    Courses get 1 to 9 sections; one in twenty is a lecture linked to labs.
+    """
+    rng = random.Random(seed)
+    records = []
+    codes = []
+    crn = 10000
+    while len(records) < sections:
+        subject = rng.choice(SUBJECTS)
+        number = str(rng.randint(1000, 4999))
+        if subject + number in codes:
+            continue
+        codes.append(subject + number)
+        if rng.random() < 0.05:
+            for link_set in range(1, rng.randint(1, 3) + 1):
+                records.append(synthetic_section(rng, crn, subject, number, 3, f"A{link_set}"))
+                crn += 1
+                for _ in range(rng.randint(1, 3)):
+                    records.append(synthetic_section(rng, crn, subject, number, 1, f"B{link_set}"))
+                    crn += 1
+        else:
+            credits = rng.choice((3, 3, 3, 3, 4, 1, 2))
+            for _ in range(rng.randint(1, 9)):
+                records.append(synthetic_section(rng, crn, subject, number, credits))
+                crn += 1
+
+    os.makedirs(directory, exist_ok=True)
+    for page, offset in enumerate(range(0, len(records), PAGE_SIZE)):
+        data = records[offset:offset + PAGE_SIZE]
+        with open(os.path.join(directory, f"classes_{page}.json"), 'w') as file:
+            json.dump({'success': True, 'totalCount': len(records), 'pageOffset': offset,
+                       'pageMaxSize': PAGE_SIZE, 'sectionsFetchedCount': len(records), 'pathMode': 'search',
+                       'data': data, 'searchResultsConfigs': [], 'ztcEncodedImage': ''}, file)
+    return codes
+
+
+def synthetic_still_needed_text(codes: List[str], singles: int, groups: int, options: int, choose: int,
+                                seed: int = 0) -> str:
+    """Still-needed lines as parse_degreeworks_pdf hands them to parse_still_needed_courses"""
+    rng = random.Random(seed)
+    picked = rng.sample(codes, min(len(codes), singles + groups * options))
+    lines = [f"1 Class in {code[:4]} {code[4:]}" for code in picked[:singles]]
+    for start in range(singles, len(picked), options):
+        group = picked[start:start + options]
+        classes = "Class" if choose == 1 else "Classes"
+        lines.append(f"{choose} {classes} in " + ", ".join(f"{code[:4]} {code[4:]}" for code in group))
+    lines.append("120 credit hours are required. You have 104, you need 16 more credits")
+    return "\n".join(lines)
+
+
+def measure(stage: str, function: Callable, repeat: int) -> Tuple[Dict, object]:
+    """Time function over repeat runs, then trace one more run for its peak memory"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'stage': stage, 'best_s': round(min(times), 6), 'median_s': round(statistics.median(times), 6),
+            'peak_mib': round(peak / (1 << 20), 3)}, result
+
+
+def benchmark_catalog(name: str, directory: str, repeat: int, seed: int,
+                      desired_credits: int = 15) -> List[Dict]:
+    results = []
+
+    def record(entry: Dict, **extra) -> None:
+        entry.update(dataset=name, **extra)
+        results.append(entry)
+        print(f"{name:>16} {entry['stage']:<24} best {entry['best_s'] * 1000:10.2f} ms  "
+              f"median {entry['median_s'] * 1000:10.2f} ms  peak {entry['peak_mib']:8.2f} MiB  "
+              + " ".join(f"{key}={value}" for key, value in extra.items()))
+
+    filenames = page_files(directory)
+    entry, rows = measure('ingest', lambda: list(iter_course_rows(directory, filenames)), repeat)
+    record(entry, sections=len(rows), pages=len(filenames))
+    # The first load writes the snapshot, so the timed runs measure the warm path
+    load_course_data(directory)
+    entry, course_data = measure('catalog_load', lambda: load_course_data(directory), repeat)
+    record(entry)
+    entry, catalog = measure('catalog_index', lambda: Catalog(course_data), repeat)
+    record(entry, sections=len(catalog))
+
+    codes = [subject + number for subject, numbers in catalog.courses.items() for number in numbers]
+    codes.sort()
+    for set_name, (singles, groups, options, choose) in REQUIREMENT_SETS.items():
+        text = synthetic_still_needed_text(codes, singles, groups, options, choose, seed)
+        entry, still_needed = measure(f"requirement_parse/{set_name}",
+                                      lambda: parse_still_needed_courses(text), repeat)
+        record(entry, requirements=len(still_needed))
+        entry, resolved = measure(f"section_resolve/{set_name}",
+                                  lambda: catalog.resolve_still_needed(still_needed), repeat)
+        record(entry, sections=sum(map(len, resolved['sections'].values())))
+
+        def solve():
+            scheduler = CourseScheduler(None, catalog, still_needed_courses=still_needed)
+            return scheduler.generate_schedules(desired_credits)
+        spans = start_trace()
+        entry, schedules = measure(f"solve/{set_name}", solve, repeat)
+        stop_trace()
+        runs = [span for span in spans if span['span'] == 'solve']
+        record(entry, schedules=len(schedules), nodes=runs[-1].get('nodes', 0) if runs else 0)
+
+        candidates = list(itertools.islice(
+            CourseScheduler(None, catalog, still_needed_courses=still_needed).iter_schedules(desired_credits),
+            BATCH_SCHEDULES))
+        if candidates:
+            def batch_score():
+                batch = ScheduleBatch.from_schedules(candidates)
+                return batch.stress_levels(batch.indices(candidates))
+            entry, _ = measure(f"batch_score/{set_name}", batch_score, repeat)
+            record(entry, schedules=len(candidates))
+
+        try:
+            from weekly_calendar import add_schedule_to_calendar
+        except ImportError as e:
+            print(f"{name:>16} calendar_build/{set_name:<9} skipped: {e}")
+            continue
+        if schedules:
+            entry, _ = measure(f"calendar_build/{set_name}", lambda: add_schedule_to_calendar(schedules[0]),
+                               repeat)
+            record(entry, sections=len(schedules[0]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='*', default=[2000, 10000],
+                        help="sections per synthetic catalog")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default='all_courses', help="directory of real pages; '' to skip")
+    parser.add_argument('--output', help="write the results here as JSON")
+    args = parser.parse_args()
+
+    results = []
+    if args.baseline:
+        results += benchmark_catalog('baseline', args.baseline, args.repeat, args.seed)
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_pages(directory, size, args.seed)
+            results += benchmark_catalog(f"synthetic-{size}", directory, args.repeat, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'cpus': os.cpu_count(), 'args': vars(args), 'results': results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
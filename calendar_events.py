@@ -0,0 +1,66 @@
+"""FullCalendar events for course meetings, kept apart from the Streamlit page that shows them"""
+from datetime import datetime, timedelta
+
+def initial_date(events=()):
+    """The first day any event recurs on, so the calendar opens on the term; today without dated events"""
+    starts = [event['startRecur'] for event in events if event.get('startRecur')]
+    # YYYY-MM-DD strings sort by date
+    return min(starts) if starts else datetime.now().strftime("%Y-%m-%d")
+
+def format_time(time_str):
+    """Format time string to ensure it's in HH:MM:SS format"""
+    if not time_str or time_str == "None":
+        return None
+    try:
+        if len(time_str) == 4:  # Format like "1330"
+            return f"{time_str[:2]}:{time_str[2:]}:00"
+        elif len(time_str.split(':')) == 2:  # Format like "13:30"
+            return f"{time_str}:00"
+        elif len(time_str.split(':')) == 3:  # Already in HH:MM:SS format
+            return time_str
+        else:
+            return None
+    except:
+        return None
+
+# FullCalendar numbers days of the week from Sunday = 0
+FULLCALENDAR_DAYS = {'U': 0, 'M': 1, 'T': 2, 'W': 3, 'R': 4, 'F': 5, 'S': 6}
+
+def format_date(date_str, days_after=0):
+    """Format a Banner MM/DD/YYYY date as YYYY-MM-DD, optionally shifted by days_after"""
+    if not date_str:
+        return None
+    try:
+        return (datetime.strptime(date_str, '%m/%d/%Y') + timedelta(days=days_after)).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+def meeting_event(course, meeting, color):
+    """One recurring FullCalendar event for a (days, begin, end, start_date, end_date) meeting, or None"""
+    days, begin_time, end_time, start_date, end_date = meeting
+    begin_time = format_time(begin_time)
+    end_time = format_time(end_time)
+    days_of_week = [FULLCALENDAR_DAYS[day] for day in days or '' if day in FULLCALENDAR_DAYS]
+    if not (begin_time and end_time and days_of_week):
+        return None
+    event = {
+        'title': f"{course.subject} {course.course_number}",
+        'daysOfWeek': days_of_week,
+        'startTime': begin_time,
+        'endTime': end_time,
+        'color': color,
+        'textColor': 'white',
+        'borderColor': 'rgba(0,0,0,0.2)',
+        'extendedProps': {
+            'credits': course.credit_hours,
+            'description': course.title or "No description available"
+        }
+    }
+    # The recurrence covers the meeting's dates; endRecur is exclusive, hence the extra day
+    start_recur = format_date(start_date)
+    end_recur = format_date(end_date, days_after=1)
+    if start_recur:
+        event['startRecur'] = start_recur
+    if end_recur:
+        event['endRecur'] = end_recur
+    return event
@@ -0,0 +1,297 @@
+import os
+import re
+import sys
+import threading
+from types import MappingProxyType
+from collections import OrderedDict, defaultdict
+from typing import Dict, Hashable, List, Mapping, Optional, Tuple, Union
+
+from catalog_snapshot import TERM_INDEX_FILENAME
+from data_preprocessing import Course, SectionBundle, bundle_sections, days_to_mask, load_course_data, load_terms
+from time_grid import WEEK_SLOTS, occupancy
+from tracing import logger, span
+
+# Subject and course number of a still-needed code such as "ITSC1212"
+_COURSE_CODE = re.compile(r'([A-Z]{4})(\d{4}\w*)')
+
+
+class Catalog:
+    """Read-only course catalog shared by every scheduler in the process.
+
+    ``courses`` has the same ``[subject][course_number]`` shape as the dict
+    returned by load_course_data(), but with mapping proxies and tuples so no
+    session can modify what the others see. Linked sections are bundled
+    once here, so every solve starts from the units a student can register.
+
+    Inverted indexes by CRN, instructor, location, instructional method,
+    campus and weekly time slot are also built once, so query() never scans
+    the whole catalog. A catalog holds one term (``term``), as CRNs are
+    only unique within a term, or every section when ``term`` is None.
+    """
+
+    def __init__(self, course_data: Dict[str, Dict[str, List[Course]]], version: int = 0,
+                 term: Optional[str] = None):
+        self.courses: Mapping[str, Mapping[str, Tuple[Course, ...]]] = MappingProxyType({
+            subject: MappingProxyType({number: tuple(sections) for number, sections in numbers.items()})
+            for subject, numbers in course_data.items()
+        })
+        self.version = version
+        self.term = term
+        self._choices: Dict[Tuple[str, str], Tuple[Union[Course, SectionBundle], ...]] = {}
+        for subject, numbers in self.courses.items():
+            for number, sections in numbers.items():
+                if any(section.link_identifier for section in sections):
+                    self._choices[(subject, number)] = tuple(bundle_sections(sections))
+        self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        self._sections = tuple(section for numbers in self.courses.values()
+                               for sections in numbers.values() for section in sections)
+        self._by_crn: Dict[str, Course] = {}
+        indexes: Dict[str, Dict[Hashable, List[Course]]] = defaultdict(lambda: defaultdict(list))
+        # Bit i of _slot_sections[slot] is set when self._sections[i] meets in that weekly slot
+        slot_sections = [0] * WEEK_SLOTS
+        for position, section in enumerate(self._sections):
+            self._by_crn[section.crn] = section
+            for banner_id in section.instructors:
+                indexes['instructor'][banner_id].append(section)
+            for building, room in section.locations:
+                indexes['building'][building].append(section)
+                indexes['location'][(building, room)].append(section)
+            indexes['method'][section.instructional_method].append(section)
+            indexes['campus'][section.campus].append(section)
+            slots = section.slots
+            while slots:
+                low = slots & -slots
+                slot_sections[low.bit_length() - 1] |= 1 << position
+                slots ^= low
+        self._indexes = {name: {key: tuple(sections) for key, sections in index.items()}
+                         for name, index in indexes.items()}
+        self._slot_sections = {slot: members for slot, members in enumerate(slot_sections) if members}
+
+    def sections(self, subject: str, course_number: str) -> Tuple[Course, ...]:
+        return self.courses.get(subject, {}).get(course_number, ())
+
+    def resolve_still_needed(self, still_needed: List[Union[str, Dict]]) -> Dict:
+        """Resolve the parsed still-needed list against the catalog in one pass.
+
+        Returns {"sections": {code: sections}, "requirements": [...]} where
+        every course code appears once in "sections", however many
+        requirements list it, and each requirement is
+        {"courses": (code, ...), "num_to_pick": n}. A single still-needed
+        course is a requirement to pick 1 of 1; entries that are not course
+        codes ("120 credit hours are required.") are left out.
+        """
+        sections: Dict[str, Tuple[Course, ...]] = {}
+        requirements = []
+        for entry in still_needed:
+            if isinstance(entry, str):
+                codes, num_to_pick = [entry], 1
+            elif isinstance(entry, dict) and entry["type"] == "options":
+                codes, num_to_pick = entry["courses"], entry["num_to_pick"]
+            else:
+                continue
+            resolved = []
+            for code in codes:
+                code = code.replace(" ", "")
+                match = _COURSE_CODE.fullmatch(code)
+                if match is None:
+                    continue
+                if code not in sections:
+                    subject, number = match.groups()
+                    sections[code] = self.query(subject=subject, course_number=number)
+                resolved.append(code)
+            if resolved:
+                requirements.append({"courses": tuple(dict.fromkeys(resolved)), "num_to_pick": num_to_pick})
+        return {"sections": sections, "requirements": requirements}
+
+    def section(self, crn: str) -> Optional[Course]:
+        return self._by_crn.get(crn)
+
+    def meeting_during(self, days: str, begin_minutes: int, end_minutes: int) -> Tuple[Course, ...]:
+        """Sections with a meeting on any of days that overlaps [begin_minutes, end_minutes)"""
+        window = occupancy(days_to_mask(days), begin_minutes, end_minutes)
+        members = 0
+        while window:
+            low = window & -window
+            members |= self._slot_sections.get(low.bit_length() - 1, 0)
+            window ^= low
+        found = []
+        while members:
+            low = members & -members
+            found.append(self._sections[low.bit_length() - 1])
+            members ^= low
+        return tuple(found)
+
+    def query(self, crn: Optional[str] = None, subject: Optional[str] = None,
+              course_number: Optional[str] = None, instructor: Optional[str] = None,
+              building: Optional[str] = None, room: Optional[str] = None, method: Optional[str] = None,
+              campus: Optional[str] = None,
+              during: Optional[Tuple[str, int, int]] = None) -> Tuple[Course, ...]:
+        """Sections matching every given criterion, in catalog order.
+
+        ``course_number`` narrows ``subject`` and ``room`` narrows
+        ``building``; either alone raises ValueError. ``instructor`` is a
+        faculty bannerId, ``method`` an instructionalMethod code such as
+        'TR', ``campus`` a campusDescription and ``during`` a
+        (days, begin_minutes, end_minutes) window as for meeting_during().
+        The smallest matching index is looked up and the rest are checked on
+        its sections; every index lists sections in catalog order, so the
+        result is in that order too.
+        """
+        if course_number is not None and subject is None:
+            raise ValueError("course_number needs a subject")
+        if room is not None and building is None:
+            raise ValueError("room needs a building")
+        candidates = []
+        if crn is not None:
+            section = self.section(crn)
+            candidates.append((section,) if section is not None else ())
+        if subject is not None:
+            if course_number is not None:
+                candidates.append(self.sections(subject, course_number))
+            else:
+                candidates.append(tuple(section for sections in self.courses.get(subject, {}).values()
+                                        for section in sections))
+        if instructor is not None:
+            candidates.append(self._indexes['instructor'].get(instructor, ()))
+        if building is not None:
+            if room is not None:
+                candidates.append(self._indexes['location'].get((building, room), ()))
+            else:
+                candidates.append(self._indexes['building'].get(building, ()))
+        if method is not None:
+            candidates.append(self._indexes['method'].get(method, ()))
+        if campus is not None:
+            candidates.append(self._indexes['campus'].get(campus, ()))
+        if during is not None:
+            candidates.append(self.meeting_during(*during))
+        if not candidates:
+            found = self._sections
+        else:
+            candidates.sort(key=len)
+            found = candidates[0]
+            for other in candidates[1:]:
+                members = set(map(id, other))
+                found = tuple(section for section in found if id(section) in members)
+        return found
+
+    def choices(self, subject: str, course_number: str) -> Tuple[Union[Course, SectionBundle], ...]:
+        """The sections of a course as choice units: single sections or bundles of linked ones"""
+        choices = self._choices.get((subject, course_number))
+        return choices if choices is not None else self.sections(subject, course_number)
+
+    def __len__(self) -> int:
+        return sum(len(sections) for numbers in self.courses.values() for sections in numbers.values())
+
+
+# Terms whose catalogs stay loaded; the least recently used one beyond this is dropped
+MAX_LOADED_TERMS = 3
+
+_lock = threading.Lock()
+# Shared catalogs by (directory, term), least recently used first
+_loaded: 'OrderedDict[Tuple[str, Optional[str]], Catalog]' = OrderedDict()
+_versions: Dict[Tuple[str, Optional[str]], int] = {}
+# One lock per catalog being loaded, so loading a term does not hold up the others
+_loading: Dict[Tuple[str, Optional[str]], threading.Lock] = {}
+# Latest term of each directory, with the (mtime_ns, size) of the term index it was read from
+_default_terms: Dict[str, Tuple[Optional[Tuple[int, int]], Optional[str]]] = {}
+
+
+def _term_index_stamp(directory: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(os.path.join(directory, TERM_INDEX_FILENAME))
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def default_term(directory: str = 'all_courses') -> Optional[str]:
+    """The latest term in directory, used whenever no term is named; None when no page has one.
+
+    It is read again whenever the term index changed, as it does once load_terms() sees a new term's pages.
+    """
+    cached = _default_terms.get(directory)
+    if cached is None or cached[0] != _term_index_stamp(directory):
+        terms = load_terms(directory) if os.path.isdir(directory) else {}
+        # load_terms() may just have rewritten the index
+        _default_terms[directory] = (_term_index_stamp(directory), max(terms) if terms else None)
+    return _default_terms[directory][1]
+
+
+def get_catalog(directory: str = 'all_courses', term: Optional[str] = None) -> Catalog:
+    """Return the process-wide catalog of term (default_term() if None), loading it on first use"""
+    if term is None:
+        term = default_term(directory)
+    key = (directory, term)
+    with _lock:
+        catalog = _loaded.get(key)
+        if catalog is not None:
+            _loaded.move_to_end(key)
+            return catalog
+        loading = _loading.setdefault(key, threading.Lock())
+    with loading:
+        with _lock:
+            catalog = _loaded.get(key)
+        if catalog is None:
+            with span('catalog_load', term=term) as load_span:
+                course_data = load_course_data(directory, term)
+                with _lock:
+                    catalog = _publish(key, Catalog(course_data, _versions.get(key, -1) + 1, term))
+                load_span.count('sections', len(catalog))
+    return catalog
+
+
+def publish_catalog(course_data: Dict[str, Dict[str, List[Course]]], directory: str = 'all_courses',
+                    term: Optional[str] = None) -> Catalog:
+    """Atomically replace the shared catalog of term (default_term() if None) with newly loaded course data.
+
+    Schedulers keep the catalog they were created with, so a session never
+    sees a mix of old and new sections; new schedulers pick up the new one.
+    """
+    if term is None:
+        term = default_term(directory)
+    key = (directory, term)
+    with _lock:
+        return _publish(key, Catalog(course_data, _versions.get(key, -1) + 1, term))
+
+
+def loaded_terms(directory: str = 'all_courses') -> List[Optional[str]]:
+    """Terms of directory with a catalog in memory, least recently used first"""
+    with _lock:
+        return [term for loaded_directory, term in _loaded if loaded_directory == directory]
+
+
+def _publish(key: Tuple[str, Optional[str]], catalog: Catalog) -> Catalog:
+    _loaded[key] = catalog
+    _loaded.move_to_end(key)
+    _versions[key] = catalog.version
+    while len(_loaded) > MAX_LOADED_TERMS:
+        # Schedulers still using an evicted catalog keep it alive until they finish
+        (directory, term), evicted = _loaded.popitem(last=False)
+        logger.info("Evicted the catalog of term %s in %s (%d sections)", term, directory, len(evicted))
+    return catalog
+
+
+def session_nbytes(*roots) -> int:
+    """Bytes held by the given per-session containers, excluding shared Courses.
+
+    Each session references catalog sections instead of copying them, so this
+    grows with the number of still-needed sections (one pointer each), not
+    with the size of the catalog.
+    """
+    seen = set()
+    stack = list(roots)
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (Course, Catalog)):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, Mapping):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return total
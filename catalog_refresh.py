@@ -0,0 +1,120 @@
+"""Keep the shared catalog in step with the Banner pages as they are re-downloaded.
+
+A refresher works on the catalogs of its own process, so it runs inside the
+process that serves them: scheduling_service.py starts one per loaded term
+(see --refresh-interval). It follows one term's catalog (see
+catalog.get_catalog). Only pages whose SHA-256 changed are re-read, and
+their sections are diffed against the catalog by CRN. Seat counts
+(Course.SEAT_FIELDS) are updated in place on the shared Course objects,
+which every scheduler sees at once. Anything else (a section added, removed or rescheduled) publishes a new
+catalog version built from the unchanged Course objects plus the new ones;
+schedulers keep the version they started with.
+"""
+import threading
+from typing import Dict, List, Optional
+
+from catalog import Catalog, default_term, get_catalog, publish_catalog
+from catalog_snapshot import page_manifest, split_pages
+from data_preprocessing import Course, iter_course_rows, load_course_pages
+from tracing import logger, span
+
+_SEAT_POSITIONS = [Course.ROW_FIELDS.index(field) for field in Course.SEAT_FIELDS]
+_STRUCTURE_POSITIONS = [index for index, field in enumerate(Course.ROW_FIELDS) if field not in Course.SEAT_FIELDS]
+
+
+def _structure(row: tuple) -> tuple:
+    return tuple(row[index] for index in _STRUCTURE_POSITIONS)
+
+
+def _seats(row: tuple) -> tuple:
+    return tuple(row[index] for index in _SEAT_POSITIONS)
+
+
+class CatalogRefresher:
+    """Re-ingests changed pages of directory and applies their section diffs to the shared catalog of a term"""
+
+    def __init__(self, directory: str = 'all_courses', catalog: Optional[Catalog] = None,
+                 term: Optional[str] = None):
+        self.directory = directory
+        if catalog is not None:
+            term = catalog.term
+        self.term = term if term is not None else default_term(directory)
+        manifest, rows = load_course_pages(directory, self.term)
+        self._manifest = manifest
+        # CRNs of each page in page order, so a rebuilt catalog keeps the order a fresh load gives
+        self._pages: Dict[str, List[str]] = {filename: [row[0] for row in page_rows]
+                                             for filename, page_rows in split_pages(manifest, rows).items()}
+        self.catalog = catalog if catalog is not None else get_catalog(directory, self.term)
+        self._lock = threading.Lock()
+
+    def refresh(self) -> Dict:
+        """Apply every page change since the last refresh.
+
+        Returns counts of the pages re-read and of the sections whose seats
+        were updated, added, removed or otherwise changed, and the catalog
+        version in use afterwards.
+        """
+        with self._lock, span('catalog_refresh', term=self.term) as refresh_span:
+            # Unchanged pages are recognized by mtime and size without being read
+            manifest = page_manifest(self.directory, self._manifest)
+            changed = [filename for filename, entry in manifest.items()
+                       if self._manifest.get(filename, {}).get('sha256') != entry['sha256']]
+            removed_pages = [filename for filename in self._manifest if filename not in manifest]
+            result = {'pages': len(changed) + len(removed_pages), 'seats': 0, 'added': 0, 'removed': 0,
+                      'changed': 0, 'version': self.catalog.version}
+            if not result['pages']:
+                self._manifest = manifest
+                return result
+
+            new_rows: Dict[str, tuple] = {}
+            pages = dict(self._pages)
+            for filename in changed:
+                rows = list(iter_course_rows(self.directory, [filename], self.term))
+                pages[filename] = [row[0] for row in rows]
+                new_rows.update((row[0], row) for row in rows)
+            for filename in removed_pages:
+                del pages[filename]
+            pages = {filename: pages[filename] for filename in manifest}
+            # A CRN that left a changed page may just have moved to another one
+            dropped = {crn for filename in changed + removed_pages for crn in self._pages.get(filename, ())
+                       if crn not in new_rows}
+            dropped -= {crn for filename in pages if filename not in changed for crn in pages[filename]}
+
+            seat_updates = []
+            replaced: Dict[str, Course] = {}
+            for crn, row in new_rows.items():
+                section = self.catalog.section(crn)
+                if section is None:
+                    replaced[crn] = Course.from_row(row)
+                    result['added'] += 1
+                elif _structure(section.to_row()) != _structure(row):
+                    replaced[crn] = Course.from_row(row)
+                    result['changed'] += 1
+                elif _seats(section.to_row()) != _seats(row):
+                    seat_updates.append((section, _seats(row)))
+            result['removed'] = sum(self.catalog.section(crn) is not None for crn in dropped)
+
+            for section, seats in seat_updates:
+                for field, value in zip(Course.SEAT_FIELDS, seats):
+                    setattr(section, field, value)
+            result['seats'] = len(seat_updates)
+
+            if replaced or result['removed']:
+                self.catalog = publish_catalog(self._course_data(pages, replaced), self.directory, self.term)
+            self._manifest = manifest
+            self._pages = pages
+            result['version'] = self.catalog.version
+            for key, value in result.items():
+                refresh_span.count(key, value)
+        logger.info("Catalog refresh: %s", result)
+        return result
+
+    def _course_data(self, pages: Dict[str, List[str]], replaced: Dict[str, Course]) -> Dict:
+        """The course dict for the new catalog, in page order, reusing every unchanged Course"""
+        course_data: Dict[str, Dict[str, List[Course]]] = {}
+        for crns in pages.values():
+            for crn in crns:
+                course = replaced.get(crn) or self.catalog.section(crn)
+                if course is not None and course.subject and course.course_number:
+                    course_data.setdefault(course.subject, {}).setdefault(course.course_number, []).append(course)
+        return course_data
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import pickle
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from tracing import logger
+
+SNAPSHOT_FILENAME = '.catalog.snapshot'
+# Which terms each page holds, so loading one term skips the pages of the others
+TERM_INDEX_FILENAME = '.catalog.snapshot.terms'
+SNAPSHOT_MAGIC = b'CATSNAP\x00'
+SNAPSHOT_VERSION = 10
+
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+def page_files(directory: str) -> List[str]:
+    """Return the sorted names of the JSON catalog pages in directory"""
+    return sorted(filename for filename in os.listdir(directory) if filename.endswith('.json'))
+
+
+def _hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def page_manifest(directory: str, previous: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+    """Describe every page by mtime, size and SHA-256.
+
+    Hashes are reused from ``previous`` for pages whose mtime and size did not
+    change, so an unchanged directory is checked without reading any page.
+    """
+    previous = previous or {}
+    manifest = {}
+    for filename in page_files(directory):
+        stat = os.stat(os.path.join(directory, filename))
+        entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        old = previous.get(filename)
+        if old and old['mtime_ns'] == entry['mtime_ns'] and old['size'] == entry['size']:
+            entry['sha256'] = old['sha256']
+        else:
+            entry['sha256'] = _hash_file(os.path.join(directory, filename))
+        manifest[filename] = entry
+    return manifest
+
+
+def _stat_matches(directory: str, manifest: Dict[str, Dict]) -> bool:
+    try:
+        if page_files(directory) != sorted(manifest):
+            return False
+        for filename, entry in manifest.items():
+            stat = os.stat(os.path.join(directory, filename))
+            if stat.st_mtime_ns != entry['mtime_ns'] or stat.st_size != entry['size']:
+                return False
+    except OSError:
+        return False
+    return True
+
+
+def _same_content(old: Dict[str, Dict], new: Dict[str, Dict]) -> bool:
+    return sorted(old) == sorted(new) and all(old[name]['sha256'] == new[name]['sha256'] for name in new)
+
+
+def snapshot_path(directory: str, term: Optional[str] = None) -> str:
+    """The snapshot of every section in directory, or with term of just that term's sections"""
+    filename = SNAPSHOT_FILENAME if term is None else f"{SNAPSHOT_FILENAME}.{term}"
+    return os.path.join(directory, filename)
+
+
+class _RowUnpickler(pickle.Unpickler):
+    """Unpickles rows of plain values only.
+
+    Rows hold tuples, strings, numbers and None, which pickle without any
+    global; refusing every global keeps a snapshot planted in the data
+    directory from naming a callable to run.
+    """
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"catalog snapshots hold no objects, found {module}.{name}")
+
+
+def _read_snapshot(path: str) -> Optional[Tuple[Dict, List[tuple]]]:
+    """The header and rows of the snapshot at path, or None when it is missing or unusable.
+
+    The whole snapshot is read and every row materialized; a current
+    snapshot only saves parsing the pages, not holding their rows.
+    """
+    try:
+        with open(path, 'rb') as file:
+            if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            (header_length,) = _HEADER_LENGTH.unpack(file.read(_HEADER_LENGTH.size))
+            header = json.loads(file.read(header_length))
+            if header.get('version') != SNAPSHOT_VERSION:
+                return None
+            rows = _RowUnpickler(file).load()
+            return (header, rows) if isinstance(rows, list) else None
+    except (OSError, ValueError, struct.error, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def write_snapshot(directory: str, manifest: Dict[str, Dict], rows: List[tuple],
+                   term: Optional[str] = None) -> None:
+    """Atomically replace the snapshot for directory (and term) with rows"""
+    header = json.dumps({'version': SNAPSHOT_VERSION, 'pages': manifest}).encode('utf-8')
+    path = snapshot_path(directory, term)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(SNAPSHOT_MAGIC)
+            file.write(_HEADER_LENGTH.pack(len(header)))
+            file.write(header)
+            pickle.dump(rows, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning("Could not write catalog snapshot %s: %s", path, e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def split_pages(manifest: Dict[str, Dict], rows: List[tuple]) -> Dict[str, List[tuple]]:
+    """The rows of each page, by filename, from the per-page 'rows' counts of manifest"""
+    pages = {}
+    offset = 0
+    for filename, entry in manifest.items():
+        pages[filename] = rows[offset:offset + entry['rows']]
+        offset += entry['rows']
+    return pages
+
+
+def load_snapshot(directory: str,
+                  term: Optional[str] = None) -> Tuple[Optional[List[tuple]], Dict[str, Dict], Dict[str, List[tuple]]]:
+    """Return (rows, manifest, cached_pages) for directory, or for one term of it.
+
+    Rows are stored page after page in manifest order, and every manifest
+    entry records its page's 'rows' count. ``rows`` is None when there is no
+    usable snapshot or any page was added, removed or changed since it was
+    written; the returned manifest then describes the current pages and,
+    with its 'rows' counts filled in, should be passed to write_snapshot
+    once the pages have been re-read. ``cached_pages`` maps the SHA-256 of
+    every page in the stale snapshot to its rows, so only pages whose
+    content changed need re-reading. A term's snapshot holds only that
+    term's rows, but its manifest still lists every page.
+    """
+    snapshot = _read_snapshot(snapshot_path(directory, term))
+    if snapshot is None:
+        return None, page_manifest(directory), {}
+
+    header, rows = snapshot
+    old_manifest = header['pages']
+    if _stat_matches(directory, old_manifest):
+        return rows, old_manifest, {}
+
+    # Something was touched: only a content change forces a rebuild.
+    manifest = page_manifest(directory, old_manifest)
+    if _same_content(old_manifest, manifest):
+        for filename, entry in manifest.items():
+            entry['rows'] = old_manifest[filename]['rows']
+        write_snapshot(directory, manifest, rows, term)
+        return rows, manifest, {}
+    cached_pages = {old_manifest[filename]['sha256']: page_rows
+                    for filename, page_rows in split_pages(old_manifest, rows).items()}
+    return None, manifest, cached_pages
+
+
+def read_term_index(directory: str) -> Dict[str, Dict]:
+    """The manifest last written by write_term_index, each entry with the page's 'terms', or {}"""
+    try:
+        with open(os.path.join(directory, TERM_INDEX_FILENAME), 'r') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return index['pages'] if index.get('version') == SNAPSHOT_VERSION else {}
+
+
+def write_term_index(directory: str, manifest: Dict[str, Dict]) -> None:
+    path = os.path.join(directory, TERM_INDEX_FILENAME)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w') as file:
+            json.dump({'version': SNAPSHOT_VERSION, 'pages': manifest}, file)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning("Could not write term index %s: %s", path, e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
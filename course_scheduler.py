@@ -1,90 +1,141 @@
-from typing import List, Dict, Union
-from collections import defaultdict
+from typing import FrozenSet, Iterable, Iterator, List, Dict, Optional, Tuple, Union
+from collections import OrderedDict, defaultdict
 import itertools
+import threading
 
-from data_preprocessing import load_course_data, Course, get_available_courses
+from catalog import Catalog, get_catalog, session_nbytes
+from data_preprocessing import Course
 from degreeworks_pdf_parser import parse_degreeworks_pdf
 from still_needed_courses_parser import parse_still_needed_courses
+from parallel_solver import parallel_rank_nearest_schedules
+from schedule_metrics import ScheduleScore, as_schedule_score
+from tracing import logger, span
+from schedule_solver import (RANK_NODE_BUDGET, ConflictMatrix, Requirement, SearchPlan, courses_overlap,
+                             credit_bands, rank_nearest_schedules, rank_plan, score_representatives,
+                             search_nearest_schedules)
+
+class UnknownSection(ValueError):
+    """A CRN that is not an available section of the still-needed courses, such as one the catalog dropped"""
 
 class CourseScheduler:
-    def __init__(self, degreeworks_pdf_file: str):
-        self.course_data = load_course_data()
-        self.still_needed_courses = self._get_still_needed_courses(degreeworks_pdf_file)
+    CREDIT_TOLERANCE = 3  # Allow ±3 credits from the desired amount
+
+    def __init__(self, degreeworks_pdf_file: Union[str, bytes, None], catalog: Catalog = None,
+                 still_needed_courses: List[Union[str, Dict]] = None, exclude_full: bool = False,
+                 term: Optional[str] = None):
+        """Schedule for the audit in degreeworks_pdf_file, or for an already parsed still_needed_courses list.
+
+        With exclude_full, sections without open seats are left out of every solve. Without a
+        catalog, the shared one of term (the latest term if None) is used.
+        """
+        # The catalog is shared by every session; only the fields below are per student
+        self.catalog = catalog if catalog is not None else get_catalog(term=term)
+        self.course_data = self.catalog.courses
+        if still_needed_courses is None:
+            still_needed_courses = self._get_still_needed_courses(degreeworks_pdf_file)
+        self.still_needed_courses = still_needed_courses
+        self.exclude_full = exclude_full
+        # Also sets self.requirements: [{"courses": codes, "num_to_pick": n}, ...]
         self.available_courses = self._get_available_courses()
+        # Derived from available_courses on first solve and reused by every later one
+        self._course_groups = None
+        self._conflict_matrix = None
+        self._requirements = None
 
-    def _get_still_needed_courses(self, pdf_file: str) -> List[Union[str, Dict]]:
+    def _get_still_needed_courses(self, pdf_file: Union[str, bytes]) -> List[Union[str, Dict]]:
         pdf_result = parse_degreeworks_pdf(pdf_file)
         return pdf_result["still_needed_courses"]
 
-    def _get_available_courses(self) -> Dict[str, List[Course]]:
-        available_courses = defaultdict(list)
-        print(f"Debug: Still needed courses: {self.still_needed_courses}")
-        
-        for course in self.still_needed_courses:
-            if isinstance(course, str):
-                course_code = course.replace(" ", "")
-                if len(course_code) >= 7:
-                    subject, number = course_code[:4], course_code[4:]
-                    print(f"Debug: Searching for {subject} {number}")
-                    sections = get_available_courses(self.course_data, [subject], [number])
-                    print(f"Debug: Found {len(sections)} sections for {subject} {number}")
-                    available_courses[course].extend(sections)
-                else:
-                    print(f"Debug: Invalid course format: {course}")
-            elif isinstance(course, dict) and course["type"] == "options":
-                for option in course["courses"]:
-                    option_code = option.replace(" ", "")
-                    if len(option_code) >= 7:
-                        subject, number = option_code[:4], option_code[4:]
-                        print(f"Debug: Searching for option {subject} {number}")
-                        sections = get_available_courses(self.course_data, [subject], [number])
-                        print(f"Debug: Found {len(sections)} sections for option {subject} {number}")
-                        available_courses[option].extend(sections)
-                    else:
-                        print(f"Debug: Invalid course option format: {option}")
-        
-        total_available = sum(len(sections) for sections in available_courses.values())
-        print(f"Debug: Total available courses: {total_available}")
+    def _get_available_courses(self) -> Dict[str, Tuple[Course, ...]]:
+        logger.debug("Still needed courses: %s", self.still_needed_courses)
+        with span('section_resolve') as resolve_span:
+            # One pass over every requirement; a code shared by several groups is looked up once
+            resolved = self.catalog.resolve_still_needed(self.still_needed_courses)
+            self.requirements = resolved["requirements"]
+            available_courses = resolved["sections"]
+            total_available = sum(len(sections) for sections in available_courses.values())
+            resolve_span.count('codes', len(available_courses))
+            resolve_span.count('sections', total_available)
+        logger.debug("Total available courses: %d in %d course codes", total_available, len(available_courses))
         return available_courses
 
-    def generate_schedules(self, desired_credits: int, max_schedules: int = 4) -> List[List[Course]]:
-        all_courses = [course for courses in self.available_courses.values() for course in courses]
-        
-        print(f"Debug: Total available courses: {len(all_courses)}")
-        print(f"Debug: Desired credits: {desired_credits}")
-        
-        credit_tolerance = 3  # Allow ±3 credits from the desired amount
-        valid_schedules = []
-        
-        # Group courses by subject and course number
-        course_groups = defaultdict(list)
-        for course in all_courses:
-            course_groups[(course.subject, course.course_number)].append(course)
+    def generate_schedules(self, desired_credits: int, max_schedules: int = 4,
+                           score: ScheduleScore = None, workers: int = 1) -> List[List[Course]]:
+        """Return the max_schedules best schedules under score (default StressScore), best first.
+
+        With workers > 1 the search runs on a process pool and returns the same schedules.
+        """
+        logger.debug("Total available courses: %d", sum(map(len, self.available_courses.values())))
+        logger.debug("Desired credits: %s", desired_credits)
         
-        # Generate combinations using one course from each group
-        unique_courses = [group[0] for group in course_groups.values()]
+        credit_tolerance = self.CREDIT_TOLERANCE
         
-        for r in range(1, len(unique_courses) + 1):
-            for combination in itertools.combinations(unique_courses, r):
-                total_credits = sum(course.credit_hours for course in combination if course.credit_hours is not None)
-                if desired_credits - credit_tolerance <= total_credits <= desired_credits + credit_tolerance:
-                    if self._is_valid_schedule(combination):
-                        valid_schedules.append(list(combination))
-                        if len(valid_schedules) >= max_schedules:
-                            break
-            if len(valid_schedules) >= max_schedules:
-                break
+        with span('solve', desired_credits=desired_credits, workers=workers) as solve_span:
+            # Every section of every course is a candidate; the search prunes by credits, conflicts and score
+            course_groups, matrix, requirements = self._solver_inputs()
+            if workers > 1:
+                valid_schedules = parallel_rank_nearest_schedules(course_groups, desired_credits, credit_tolerance,
+                                                                  max_schedules, score, workers, requirements)
+            else:
+                valid_schedules = rank_nearest_schedules(course_groups, desired_credits, credit_tolerance,
+                                                         max_schedules, score, matrix, requirements)
+            solve_span.count('schedules', len(valid_schedules))
         
-        print(f"Debug: Found {len(valid_schedules)} valid schedules")
+        logger.debug("Found %d valid schedules", len(valid_schedules))
         
         if not valid_schedules:
-            print("Debug: No valid schedules generated. Reasons could be:")
-            print(f"1. Not enough courses to reach {desired_credits} credits (±{credit_tolerance})")
-            print("2. Required courses conflict with each other")
-            print(f"3. No combination of courses falls within {desired_credits} ±{credit_tolerance} credits")
+            logger.debug("No valid schedules generated. Reasons could be:\n"
+                         "1. Not enough courses to reach %s credits (±%s)\n"
+                         "2. Required courses conflict with each other\n"
+                         "3. No combination of courses falls within %s ±%s credits",
+                         desired_credits, credit_tolerance, desired_credits, credit_tolerance)
         
         return valid_schedules
 
+    def iter_schedules(self, desired_credits: int, ranked_first: int = 4,
+                       score: ScheduleScore = None) -> Iterator[List[Course]]:
+        """Yield schedules on demand: the ranked_first best, then every other one nearest-credits first.
+
+        Nothing past what the caller consumes is computed, and only the
+        search stack and the handful of ranked schedules are held.
+        """
+        course_groups, matrix, requirements = self._solver_inputs()
+        shown = set()
+        if ranked_first:
+            for schedule in rank_nearest_schedules(course_groups, desired_credits, self.CREDIT_TOLERANCE,
+                                                   ranked_first, score, matrix, requirements):
+                shown.add(frozenset(map(id, schedule)))
+                yield schedule
+        for schedule in search_nearest_schedules(course_groups, desired_credits, self.CREDIT_TOLERANCE, matrix,
+                                                 requirements):
+            if frozenset(map(id, schedule)) not in shown:
+                yield schedule
+
+    def session(self, desired_credits: int, score: ScheduleScore = None) -> 'SolveSession':
+        """A SolveSession for interactive edits: locked sections, left out courses, a new credit target"""
+        return SolveSession(self, desired_credits, score)
+
+    def _solver_inputs(self) -> Tuple[List[List[Course]], ConflictMatrix, List[Requirement]]:
+        if self._conflict_matrix is None:
+            # One group per course code; linked sections are chosen as the bundles the catalog built for them
+            codes = list(self.available_courses)
+            self._course_groups = []
+            for code in codes:
+                available = {id(course) for course in self.available_courses[code]}
+                self._course_groups.append([unit for unit in self.catalog.choices(code[:4], code[4:])
+                                            if all(id(section) in available for section in unit.sections)])
+            # Each "choose N of" requirement caps how many of its courses one schedule may take
+            group_index = {code: index for index, code in enumerate(codes)}
+            self._requirements = [([group_index[code] for code in requirement["courses"]],
+                                   requirement["num_to_pick"]) for requirement in self.requirements]
+            self._conflict_matrix = ConflictMatrix([course for group in self._course_groups for course in group])
+        if self.exclude_full:
+            # Seat counts are updated in place (see catalog_refresh), so full sections are dropped each time the
+            # inputs are taken; a SolveSession takes them once (see its docstring)
+            return ([[unit for unit in group if not any(section.is_full for section in unit.sections)]
+                     for group in self._course_groups], self._conflict_matrix, self._requirements)
+        return self._course_groups, self._conflict_matrix, self._requirements
+
     def _is_valid_schedule(self, schedule: List[Course]) -> bool:
         for i, course1 in enumerate(schedule):
             for course2 in schedule[i+1:]:
@@ -92,34 +143,11 @@ class CourseScheduler:
                     return False
         return True
 
-    def _courses_overlap(self, course1: Course, course2: Course) -> bool:
-        if not (course1.days and course2.days and course1.begin_time and course2.begin_time and course1.end_time and course2.end_time):
-            return False
-
-        days_overlap = any(day in course2.days for day in course1.days)
-        if not days_overlap:
-            return False
-
-        time1 = (self._time_to_minutes(course1.begin_time), self._time_to_minutes(course1.end_time))
-        time2 = (self._time_to_minutes(course2.begin_time), self._time_to_minutes(course2.end_time))
+    _courses_overlap = staticmethod(courses_overlap)
 
-        return max(time1[0], time2[0]) < min(time1[1], time2[1])
-
-    @staticmethod
-    def _time_to_minutes(time_str: str) -> int:
-        if not time_str:
-            return 0
-        try:
-            # Handle 24-hour time format without colon
-            if len(time_str) == 4:
-                hours = int(time_str[:2])
-                minutes = int(time_str[2:])
-            else:
-                hours, minutes = map(int, time_str.split(':'))
-            return hours * 60 + minutes
-        except ValueError:
-            print(f"Debug: Invalid time format: {time_str}")
-            return 0
+    def session_nbytes(self) -> int:
+        """Memory this scheduler adds on top of the shared catalog"""
+        return session_nbytes(self.still_needed_courses, self.available_courses, self.requirements)
 
     def print_available_courses(self):
         for course, sections in self.available_courses.items():
@@ -128,6 +156,227 @@ class CourseScheduler:
                 print(f"  CRN: {section.crn}, Title: {section.title}, Days: {section.days}, Time: {section.begin_time}-{section.end_time}")
             print()
 
+# (locked CRNs, excluded course codes)
+Constraints = Tuple[FrozenSet[str], FrozenSet[str]]
+
+class SolveSession:
+    """Repeated solves for one scheduler while the student edits the constraints.
+
+    Every solve takes the credit target (the session's desired_credits by
+    default), the CRNs locked into every schedule and the course codes left
+    out as arguments; the session holds no constraints of its own, so
+    concurrent callers can share it. What does not depend on
+    them is built once: the conflict matrix, the score's per-section caches
+    and each course's score representatives. Each set of constraints gets
+    one SearchPlan, shared by all its credit bands, and the ranked schedules
+    of every (constraints, band) pair are kept, so an edit only searches the
+    bands it changes. Kept schedules that still satisfy new constraints
+    also bound the new search from the start, which makes undoing an edit
+    nearly free. Results are the ones a fresh generate_schedules would give,
+    unless a band's search runs out of its node budget (see rank_plan),
+    where the seeded bound can change which schedules were found by then.
+    With the scheduler's exclude_full, the sections full when the session
+    starts are left out for its whole life: seat changes after that are not
+    seen, so callers drop the session once the catalog is refreshed, as
+    scheduling_service does.
+    """
+    MAX_PLANS = 16
+    MAX_RANKINGS = 128
+
+    def __init__(self, scheduler: CourseScheduler, desired_credits: int, score: ScheduleScore = None):
+        self.scheduler = scheduler
+        self.desired_credits = desired_credits
+        self.score = as_schedule_score(score)
+        self._groups, self._matrix, self._requirements = scheduler._solver_inputs()
+        self._codes = list(scheduler.available_courses)
+        self._representatives = score_representatives(self._groups, self.score)
+        self._code_of = {}
+        self._code_of_crn = {}
+        for code, group in zip(self._codes, self._groups):
+            for unit in group:
+                self._code_of[id(unit)] = code
+                for section in unit.sections:
+                    self._code_of_crn[section.crn] = code
+        self._plans: 'OrderedDict[tuple, SearchPlan]' = OrderedDict()
+        # (constraints, band) -> (k asked for, [(score, units), ...] best first)
+        self._rankings: 'OrderedDict[Tuple[Constraints, float], Tuple[int, list]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _course_of(self, crn: str) -> str:
+        code = self._code_of_crn.get(crn)
+        if code is None:
+            raise UnknownSection(f"CRN {crn} is not an available section of the still needed courses")
+        return code
+
+    def _constraints(self, locked: Iterable[str], excluded: Iterable[str]) -> Constraints:
+        locked = frozenset(locked)
+        excluded = frozenset(excluded)
+        for crn in locked:
+            if self._course_of(crn) in excluded:
+                raise ValueError(f"CRN {crn} is locked but its course {self._code_of_crn[crn]} is excluded")
+        return locked, excluded
+
+    def _course_groups(self, constraints: Constraints,
+                       representatives: bool) -> Tuple[List[List[Course]], List[int]]:
+        """Each course's units under the constraints, and the indices of the courses locked in"""
+        locked, excluded = constraints
+        locked_by_code = defaultdict(set)
+        for crn in locked:
+            locked_by_code[self._code_of_crn[crn]].add(crn)
+        course_groups = []
+        required = []
+        for index, code in enumerate(self._codes):
+            if code in excluded:
+                group = []
+            elif code in locked_by_code:
+                # The units holding every locked section of the course; a lecture locked
+                # without its lab still leaves the lab bundles to choose from
+                crns = locked_by_code[code]
+                group = [unit for unit in self._groups[index]
+                         if crns <= {section.crn for section in unit.sections}]
+                if representatives:
+                    group = score_representatives([group], self.score)[0]
+                required.append(index)
+            else:
+                group = self._representatives[index] if representatives else self._groups[index]
+            course_groups.append(group)
+        return course_groups, required
+
+    def _plan(self, constraints: Constraints, ranked: bool = True) -> SearchPlan:
+        key = (constraints, ranked)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+        course_groups, required = self._course_groups(constraints, ranked)
+        score = self.score
+        section_key = (lambda unit: score(list(unit.sections))) if ranked else None
+        plan = SearchPlan(course_groups, self._matrix, section_key, self._requirements, required)
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.MAX_PLANS:
+                self._plans.popitem(last=False)
+        return plan
+
+    def _satisfies(self, units, constraints: Constraints) -> bool:
+        locked, excluded = constraints
+        if any(self._code_of[id(unit)] in excluded for unit in units):
+            return False
+        crns = {section.crn for unit in units for section in unit.sections}
+        return locked <= crns
+
+    def _seed_bound(self, constraints: Constraints, credits: float, k: int) -> float:
+        """The k-th best score among kept schedules that satisfy constraints, or infinity.
+
+        Those schedules (or score-equivalent ones) are in the new search
+        space, so its k best can score no worse.
+        """
+        scores = {}
+        with self._lock:
+            kept = [ranked for (_, band), (_, ranked) in self._rankings.items() if band == credits]
+        for ranked in kept:
+            for value, units in ranked:
+                if self._satisfies(units, constraints):
+                    # Equivalent schedules are one schedule to the search, so count them once
+                    scores[frozenset((self._code_of[id(unit)], self.score.equivalence_key(unit))
+                                     for unit in units)] = value
+        if len(scores) < k:
+            return float('inf')
+        return sorted(scores.values())[k - 1]
+
+    def _ranked(self, constraints: Constraints, plan: SearchPlan, credits: float, k: int) -> list:
+        key = (constraints, credits)
+        with self._lock:
+            cached = self._rankings.get(key)
+            if cached is not None:
+                self._rankings.move_to_end(key)
+        # A longer ranking, or one that ran out of schedules, holds the answer for any k
+        if cached is not None and (cached[0] >= k or len(cached[1]) < cached[0]):
+            return cached[1][:k]
+        bound = self._seed_bound(constraints, credits, k)
+        ranked = [(value, [plan.sections[i] for i in positions]) for value, _, positions
+                  in rank_plan(plan, credits, credits, k, self.score, outer_bound=lambda: bound,
+                               budget=RANK_NODE_BUDGET)]
+        with self._lock:
+            self._rankings[key] = (k, ranked)
+            while len(self._rankings) > self.MAX_RANKINGS:
+                self._rankings.popitem(last=False)
+        return ranked
+
+    def generate_schedules(self, desired_credits: Optional[int] = None, max_schedules: int = 4,
+                           locked: Iterable[str] = (), excluded: Iterable[str] = ()) -> List[List[Course]]:
+        """The max_schedules best schedules under the constraints, as CourseScheduler.generate_schedules"""
+        if desired_credits is None:
+            desired_credits = self.desired_credits
+        constraints = self._constraints(locked, excluded)
+        ranked = []
+        with span('solve', desired_credits=desired_credits, locked=len(constraints[0]),
+                  excluded=len(constraints[1])) as solve_span:
+            plan = self._plan(constraints)
+            for credits in credit_bands(desired_credits, self.scheduler.CREDIT_TOLERANCE):
+                if len(ranked) >= max_schedules:
+                    break
+                if credits > 0:
+                    ranked.extend(self._ranked(constraints, plan, credits, max_schedules - len(ranked)))
+            solve_span.count('schedules', len(ranked))
+        return [[section for unit in units for section in unit.sections] for _, units in ranked]
+
+    def iter_schedules(self, desired_credits: Optional[int] = None, ranked_first: int = 4,
+                       locked: Iterable[str] = (), excluded: Iterable[str] = ()) -> Iterator[List[Course]]:
+        """CourseScheduler.iter_schedules under the constraints"""
+        if desired_credits is None:
+            desired_credits = self.desired_credits
+        constraints = self._constraints(locked, excluded)
+        shown = set()
+        for schedule in self.generate_schedules(desired_credits, ranked_first, *constraints):
+            shown.add(frozenset(map(id, schedule)))
+            yield schedule
+        plan = self._plan(constraints, ranked=False)
+        for credits in credit_bands(desired_credits, self.scheduler.CREDIT_TOLERANCE):
+            if credits <= 0:
+                continue
+            for schedule in plan.search(credits, credits):
+                if frozenset(map(id, schedule)) not in shown:
+                    yield schedule
+
+class SchedulePager:
+    """Forward-only pages over a lazy schedule iterator; only the current page is held.
+
+    An error raised by the iterator (a ServiceError from scheduling_client,
+    say) propagates out of next_page and leaves the pager as it was, with
+    the schedules already read kept, so calling next_page again retries.
+    """
+
+    def __init__(self, schedules: Iterator[List[Course]], page_size: int = 4):
+        self._schedules = iter(schedules)
+        self._filling: List[List[Course]] = []
+        self.page_size = page_size
+        self.page_number = 0
+        self.page: List[List[Course]] = []
+        self.exhausted = False
+
+    def next_page(self) -> List[List[Course]]:
+        if not self.exhausted:
+            # The lazy source only works while a page is being filled, so that is what the span times:
+            # the search itself in-process, or the fetch from the scheduling service
+            with span('page_fill', page=self.page_number + 1) as page_span:
+                # One schedule past the page tells whether another page follows; extend keeps
+                # the schedules read before an error, for the retry
+                self._filling.extend(itertools.islice(self._schedules, self.page_size + 1 - len(self._filling)))
+                page, self._filling = self._filling[:self.page_size], self._filling[self.page_size:]
+                page_span.count('schedules', len(page))
+            self.exhausted = not self._filling
+            if page:
+                self.page = page
+                self.page_number += 1
+        return self.page
+
+    @property
+    def first_index(self) -> int:
+        """Overall position of the first schedule on the current page, counting from 0"""
+        return (self.page_number - 1) * self.page_size
+
 def main():
     scheduler = CourseScheduler("degreeworks_pdfs/rohan-salwekar-degreeworks.pdf")
     print("Available Courses:")
@@ -140,7 +389,7 @@ def main():
         print("\nExample schedules:")
         for i, schedule in enumerate(schedules, 1):
             print(f"\nSchedule {i}:")
-            total_credits = sum(course.credit_hours for course in schedule if course.credit_hours is not None)
+            total_credits = sum(course.credits for course in schedule)
             print(f"Total Credits: {total_credits}")
             for course in schedule:
                 print(f"{course.subject} {course.course_number}: {course.title} - Credits: {course.credit_hours}, Days: {course.days}, Time: {course.begin_time}-{course.end_time}")
@@ -1,29 +1,197 @@
+import itertools
 import json
 import os
-from typing import List, Dict, Union
+import re
+import sys
+from datetime import datetime
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 from collections import defaultdict
 
+from catalog_snapshot import load_snapshot, page_manifest, read_term_index, write_snapshot, write_term_index
+from time_grid import occupancy
+from tracing import logger
+
+_INTERNED_FIELDS = frozenset(('term', 'subject', 'course_number', 'building', 'days', 'start_date', 'end_date',
+                              'link_identifier', 'instructional_method', 'campus'))
+
+# Bit for each Banner meeting day in Course.day_mask
+DAY_BITS = {'M': 1, 'T': 2, 'W': 4, 'R': 8, 'F': 16, 'S': 32, 'U': 64}
+
+def time_to_minutes(time_str: str) -> int:
+    if not time_str:
+        return 0
+    try:
+        # Handle 24-hour time format without colon
+        if len(time_str) == 4:
+            hours = int(time_str[:2])
+            minutes = int(time_str[2:])
+        else:
+            hours, minutes = map(int, time_str.split(':'))
+        return hours * 60 + minutes
+    except ValueError:
+        logger.debug("Invalid time format: %s", time_str)
+        return 0
+
+def days_to_mask(days: str) -> int:
+    mask = 0
+    for day in days or '':
+        mask |= DAY_BITS[day]
+    return mask
+
+# Date ordinals used when a meeting has no start or end date: always overlapping
+_OPEN_START, _OPEN_END = 0, 10 ** 7
+
+def date_to_ordinal(date_str: str, default: int) -> int:
+    """Banner MM/DD/YYYY date as a proleptic Gregorian ordinal"""
+    if not date_str:
+        return default
+    try:
+        return datetime.strptime(date_str, '%m/%d/%Y').toordinal()
+    except ValueError:
+        logger.debug("Invalid date format: %s", date_str)
+        return default
+
+def _get_meeting_days(meeting):
+    days = []
+    if meeting.get('monday'): days.append('M')
+    if meeting.get('tuesday'): days.append('T')
+    if meeting.get('wednesday'): days.append('W')
+    if meeting.get('thursday'): days.append('R')
+    if meeting.get('friday'): days.append('F')
+    if meeting.get('saturday'): days.append('S')
+    if meeting.get('sunday'): days.append('U')
+    return ''.join(days)
+
+def _meeting_slots(days: str, begin_time: str, end_time: str) -> int:
+    if not (begin_time and end_time):
+        return 0
+    return occupancy(days_to_mask(days), time_to_minutes(begin_time), time_to_minutes(end_time))
+
+def _meeting_days(meetings) -> str:
+    """Every day any of the meetings is on, in Banner's M..U order"""
+    days = set(''.join(meeting[0] or '' for meeting in meetings))
+    return ''.join(day for day in DAY_BITS if day in days)
+
+def meeting_minutes(meetings) -> tuple:
+    """The distinct weekly meetings with times, as (day_mask, begin_minutes, end_minutes)"""
+    windows = {}
+    for days, begin_time, end_time, _, _ in meetings:
+        if days and begin_time and end_time:
+            begin_minutes, end_minutes = time_to_minutes(begin_time), time_to_minutes(end_time)
+            if begin_minutes < end_minutes:
+                windows[(days_to_mask(days), begin_minutes, end_minutes)] = None
+    return tuple(windows)
+
+def merge_meeting_blocks(meetings) -> tuple:
+    """Merge (days, begin, end, start_date, end_date) meetings into date-range occupancy blocks.
+
+    Meetings sharing a date range are ORed into one weekly bitset, giving a
+    sorted tuple of (first_day, last_day, slots) with date ordinals.
+    """
+    merged = defaultdict(int)
+    for days, begin_time, end_time, start_date, end_date in meetings:
+        slots = _meeting_slots(days, begin_time, end_time)
+        if slots:
+            key = (date_to_ordinal(start_date, _OPEN_START), date_to_ordinal(end_date, _OPEN_END))
+            merged[key] |= slots
+    return tuple(sorted((first, last, slots) for (first, last), slots in merged.items()))
+
+def blocks_conflict(blocks1: tuple, blocks2: tuple) -> bool:
+    """True when two merged block tuples share a slot while their date ranges overlap"""
+    for first1, last1, slots1 in blocks1:
+        for first2, last2, slots2 in blocks2:
+            if slots1 & slots2 and first1 <= last2 and first2 <= last1:
+                return True
+    return False
+
+def _as_tuples(value):
+    # JSON turns the nested tuples of a row into lists
+    return tuple(_as_tuples(item) for item in value) if isinstance(value, list) else value
+
 class Course:
+    # Attributes stored per section in the catalog snapshot, in row order;
+    # ``term`` is Banner's term code, such as '202510'.
+    # begin_time through room describe the first meeting with times (the
+    # first meeting if none has any); days, start_date and end_date span all
+    # of them, and ``meetings`` lists every meeting as
+    # (days, begin_time, end_time, start_date, end_date). link_identifier is
+    # Banner's linkIdentifier for linked sections and None otherwise;
+    # ``instructors`` holds faculty bannerIds and ``locations`` the distinct
+    # (building, room) of every meeting. The SEAT_FIELDS change all through
+    # registration and are updated in place by catalog_refresh. The last seven
+    # are derived once at ingest so the scheduler never has to re-parse days,
+    # times, dates or missing credits; ``meeting_minutes`` holds every
+    # distinct timed meeting for the schedule metrics.
+    SEAT_FIELDS = ('seats_available', 'enrollment', 'wait_available')
+    ROW_FIELDS = ('crn', 'term', 'subject', 'course_number', 'title', 'credit_hours', 'begin_time', 'end_time',
+                  'building', 'room', 'days', 'start_date', 'end_date', 'meetings', 'link_identifier',
+                  'instructors', 'instructional_method', 'campus', 'locations') + SEAT_FIELDS + (
+                  'day_mask', 'begin_minutes', 'end_minutes', 'credits', 'slots', 'meeting_blocks',
+                  'meeting_minutes')
+    __slots__ = ROW_FIELDS
+
     def __init__(self, data: Dict):
         self.crn = data.get('courseReferenceNumber')
+        self.term = data.get('term')
         self.subject = data.get('subject')
         self.course_number = data.get('courseNumber')
         self.title = data.get('courseTitle')
         self.credit_hours = data.get('creditHours')
-        self.meetings = data.get('meetingsFaculty', [])
+        if self.credit_hours is None:
+            # Variable-credit sections leave creditHours null and give the range instead
+            self.credit_hours = data.get('creditHourLow')
+        self.link_identifier = data.get('linkIdentifier') if data.get('isSectionLinked') else None
+        self.instructors = tuple(sys.intern(faculty['bannerId']) for faculty in data.get('faculty') or []
+                                 if faculty.get('bannerId'))
+        self.instructional_method = data.get('instructionalMethod')
+        self.campus = data.get('campusDescription')
+        self.seats_available = data.get('seatsAvailable')
+        self.enrollment = data.get('enrollment')
+        self.wait_available = data.get('waitAvailable')
+        meeting_times = [meeting.get('meetingTime') or {} for meeting in data.get('meetingsFaculty') or []]
+        self.meetings = tuple(
+            tuple(sys.intern(value) if value else value for value in (
+                _get_meeting_days(meeting), meeting.get('beginTime'), meeting.get('endTime'),
+                meeting.get('startDate'), meeting.get('endDate')))
+            for meeting in meeting_times)
+        self.locations = tuple(dict.fromkeys(
+            (sys.intern(meeting['building']), meeting.get('room'))
+            for meeting in meeting_times if meeting.get('building')))
         
-        if self.meetings and len(self.meetings) > 0:
-            meeting = self.meetings[0].get('meetingTime', {})
+        if meeting_times:
+            # An online or TBA first meeting should not hide a timed one after it
+            meeting = next((meeting for meeting in meeting_times
+                            if meeting.get('beginTime') and meeting.get('endTime')), meeting_times[0])
             self.begin_time = meeting.get('beginTime')
             self.end_time = meeting.get('endTime')
             self.building = meeting.get('building')
             self.room = meeting.get('room')
-            self.days = self._get_meeting_days(meeting)
-            self.start_date = meeting.get('startDate')
-            self.end_date = meeting.get('endDate')
+            self.days = _meeting_days(self.meetings)
+            dated = [(date_to_ordinal(start, _OPEN_START), start) for _, _, _, start, _ in self.meetings if start]
+            self.start_date = min(dated)[1] if dated else None
+            dated = [(date_to_ordinal(end, _OPEN_END), end) for _, _, _, _, end in self.meetings if end]
+            self.end_date = max(dated)[1] if dated else None
         else:
             self.begin_time = self.end_time = self.building = self.room = self.days = self.start_date = self.end_date = None
 
+        self.day_mask = days_to_mask(self.days)
+        if self.begin_time and self.end_time:
+            self.begin_minutes = time_to_minutes(self.begin_time)
+            self.end_minutes = time_to_minutes(self.end_time)
+        else:
+            # An empty interval never overlaps anything
+            self.begin_minutes = self.end_minutes = 0
+        # Every meeting merged by date range, plus their union as one weekly
+        # bitset (see time_grid) that rules out most conflicts with one AND
+        self.meeting_blocks = merge_meeting_blocks(self.meetings)
+        self.meeting_minutes = meeting_minutes(self.meetings)
+        self.slots = 0
+        for _, _, slots in self.meeting_blocks:
+            self.slots |= slots
+        # Numeric credits with missing values as 0; whole numbers are stored as int
+        credits = self.credit_hours or 0
+        self.credits = int(credits) if credits == int(credits) else credits
+
         # print(f"Debug: Created Course object:")
         # print(f"  CRN: {self.crn}")
         # print(f"  Subject: {self.subject}")
@@ -34,38 +202,224 @@ class Course:
         # print(f"  End Time: {self.end_time}")
         # print(f"  Days: {self.days}")
 
-    def _get_meeting_days(self, meeting):
-        days = []
-        if meeting.get('monday'): days.append('M')
-        if meeting.get('tuesday'): days.append('T')
-        if meeting.get('wednesday'): days.append('W')
-        if meeting.get('thursday'): days.append('R')
-        if meeting.get('friday'): days.append('F')
-        if meeting.get('saturday'): days.append('S')
-        if meeting.get('sunday'): days.append('U')
-        return ''.join(days)
-
-def load_course_data() -> Dict[str, Dict[str, List[Course]]]:
-    data = []
-    directory = 'all_courses'
-    
+    @property
+    def sections(self) -> tuple:
+        """The sections registered when this one is chosen (see SectionBundle)"""
+        return (self,)
+
+    @property
+    def is_full(self) -> bool:
+        """No seats left; sections without seat counts are taken to be open"""
+        return self.seats_available is not None and self.seats_available <= 0
+
+    def to_row(self) -> tuple:
+        row = []
+        for field in self.ROW_FIELDS:
+            value = getattr(self, field)
+            if field in _INTERNED_FIELDS and value:
+                # Repetitive columns share one string object across all rows
+                value = sys.intern(value)
+            row.append(value)
+        return tuple(row)
+
+    @classmethod
+    def from_row(cls, row: tuple) -> 'Course':
+        course = cls.__new__(cls)
+        for field, value in zip(cls.ROW_FIELDS, row):
+            setattr(course, field, value)
+        return course
+
+    def to_json(self) -> Dict:
+        """The row as a JSON-ready dict; tuples become lists"""
+        return dict(zip(self.ROW_FIELDS, self.to_row()))
+
+    @classmethod
+    def from_json(cls, data: Dict) -> 'Course':
+        return cls.from_row(tuple(_as_tuples(data.get(field)) for field in cls.ROW_FIELDS))
+
+class SectionBundle:
+    """Linked sections (a lecture and its lab, say) that are registered together.
+
+    It offers the solver the same credits, slots and meeting_blocks a single
+    Course does, so a bundle is one choice; ``sections`` lists its members.
+    """
+
+    __slots__ = ('sections', 'credits', 'slots', 'meeting_blocks')
+
+    def __init__(self, sections):
+        self.sections = tuple(sections)
+        self.credits = sum(section.credits for section in self.sections)
+        merged = defaultdict(int)
+        for section in self.sections:
+            for first, last, slots in section.meeting_blocks:
+                merged[(first, last)] |= slots
+        self.meeting_blocks = tuple(sorted((first, last, slots) for (first, last), slots in merged.items()))
+        self.slots = 0
+        for _, _, slots in self.meeting_blocks:
+            self.slots |= slots
+
+def bundle_sections(sections: List[Course]) -> List[Union[Course, SectionBundle]]:
+    """Turn the sections of one course into the units a student can actually choose.
+
+    Unlinked sections stand alone. A linkIdentifier is read as a component
+    letter followed by a link set ("A1" lectures go with "B1" labs), and
+    every conflict-free pick of one section per component of a set becomes a
+    SectionBundle. Linked sections whose set has no other component are kept
+    on their own rather than dropped.
+    """
+    units: List[Union[Course, SectionBundle]] = []
+    link_sets = defaultdict(lambda: defaultdict(list))
+    for section in sections:
+        if section.link_identifier:
+            link_sets[section.link_identifier[1:]][section.link_identifier[:1]].append(section)
+        else:
+            units.append(section)
+    for components in link_sets.values():
+        if len(components) < 2:
+            units.extend(section for members in components.values() for section in members)
+            continue
+        for members in itertools.product(*(components[key] for key in sorted(components))):
+            if not any(blocks_conflict(a.meeting_blocks, b.meeting_blocks)
+                       for i, a in enumerate(members) for b in members[i + 1:]):
+                units.append(SectionBundle(members))
+    return units
+
+_DATA_ARRAY_START = re.compile(r'"data"\s*:\s*\[')
+_decoder = json.JSONDecoder()
+
+def iter_page_records(file_path: str, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """Yield the section records of a Banner page one at a time.
+
+    Only the record being decoded and one read chunk are held in memory, so
+    the surrounding page (and searchResultsConfigs, ztcEncodedImage, ...) is
+    never materialized.
+    """
+    with open(file_path, 'r') as file:
+        buffer = ''
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, eof
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            return not eof
+
+        while True:
+            match = _DATA_ARRAY_START.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            # Keep a short tail in case the key straddles two chunks
+            buffer = buffer[-16:]
+            if not fill():
+                return
+
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                buffer, position = '', 0
+                if not fill():
+                    raise ValueError(f"Unterminated data array in {file_path}")
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                record, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The record continues in the next chunk
+                buffer, position = buffer[position:], 0
+                if not fill():
+                    raise
+                continue
+            yield record
+            position = end
+
+def iter_course_rows(directory: str, filenames: List[str], term: Optional[str] = None) -> Iterator[tuple]:
+    """Stream every page in filenames, projecting each record (of term, if given) to a Course row"""
+    for filename in filenames:
+        for course_data in iter_page_records(os.path.join(directory, filename)):
+            if term is None or course_data.get('term') == term:
+                yield Course(course_data).to_row()
+
+def page_terms(directory: str, manifest: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict[str, str]]:
+    """The terms on each page, as filename -> {term: termDesc}.
+
+    Kept in the term index next to the snapshots; only pages whose content
+    changed since it was written are scanned again.
+    """
+    index = read_term_index(directory)
+    if manifest is None:
+        manifest = page_manifest(directory, index)
+    pages = {}
+    updated = {}
+    for filename, entry in manifest.items():
+        old = index.get(filename)
+        if old is not None and old['sha256'] == entry['sha256']:
+            terms = old['terms']
+        else:
+            terms = {}
+            for record in iter_page_records(os.path.join(directory, filename)):
+                if record.get('term'):
+                    terms.setdefault(record['term'], record.get('termDesc'))
+        pages[filename] = terms
+        updated[filename] = {'mtime_ns': entry['mtime_ns'], 'size': entry['size'], 'sha256': entry['sha256'],
+                             'terms': terms}
+    if updated != index:
+        write_term_index(directory, updated)
+    return pages
+
+def load_terms(directory: str = 'all_courses') -> Dict[str, str]:
+    """Every term with sections in directory, as term code -> termDesc, in term order"""
+    terms = {}
+    for page in page_terms(directory).values():
+        terms.update(page)
+    return dict(sorted(terms.items()))
+
+def load_course_pages(directory: str = 'all_courses',
+                      term: Optional[str] = None) -> Tuple[Dict[str, Dict], List[tuple]]:
+    """Return (manifest, rows): one Course row per section, page after page in manifest order.
+
+    With term, only that term's sections are returned, from its own
+    snapshot, and pages without the term are never read. The rows come from
+    the snapshot when it is current; otherwise only the pages whose content
+    changed since it was written are re-read.
+    """
+    rows, manifest, cached_pages = load_snapshot(directory, term)
+    if rows is None:
+        terms = page_terms(directory, manifest) if term is not None else None
+        rows = []
+        reread = 0
+        for filename, entry in manifest.items():
+            page_rows = cached_pages.get(entry['sha256'])
+            if page_rows is None:
+                if terms is not None and term not in terms[filename]:
+                    page_rows = []
+                else:
+                    page_rows = list(iter_course_rows(directory, [filename], term))
+                    reread += 1
+            entry['rows'] = len(page_rows)
+            rows.extend(page_rows)
+        logger.debug("Re-read %d of %d pages in %s for term %s", reread, len(manifest), directory, term)
+        write_snapshot(directory, manifest, rows, term)
+    return manifest, rows
+
+def load_course_rows(directory: str = 'all_courses', term: Optional[str] = None) -> List[tuple]:
+    """Return one Course row per section (of term, if given), from the snapshot when it is current"""
+    return load_course_pages(directory, term)[1]
+
+def load_course_data(directory: str = 'all_courses',
+                     term: Optional[str] = None) -> Dict[str, Dict[str, List[Course]]]:
+    """Sections by subject and course number, of every term or only of term"""
     if not os.path.exists(directory):
-        print(f"Error: Directory {directory} does not exist.")
+        logger.error("Directory %s does not exist.", directory)
         return {}
 
-    for filename in os.listdir(directory):
-        if filename.endswith('.json'):
-            file_path = os.path.join(directory, filename)
-            with open(file_path, 'r') as file:
-                json_data = json.load(file)
-                if isinstance(json_data, dict) and 'data' in json_data:
-                    data.extend(json_data['data'])
-    
-    # print(f"Debug: Loaded {len(data)} courses from JSON files")
-
     course_dict = defaultdict(lambda: defaultdict(list))
-    for course_data in data:
-        course = Course(course_data)
+    for row in load_course_rows(directory, term):
+        course = Course.from_row(row)
         if course.subject and course.course_number:
             course_dict[course.subject][course.course_number].append(course)
         # else:
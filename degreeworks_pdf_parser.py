@@ -1,23 +1,143 @@
+import io
+import itertools
+import multiprocessing
+import os
 import pdfplumber
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional, Tuple, Union
+from parse_cache import cache_key, load_cached, store_cached
 from still_needed_courses_parser import parse_still_needed_courses
+from tracing import logger, span
+
+STILL_NEEDED_PATTERN = re.compile(r'Still needed:\s*(\d+.*?)(?:\n|$)', re.IGNORECASE | re.MULTILINE)
+# A page break right after the label leaves the requirement for the next page
+_CUT_OFF = re.compile(r'Still needed:\s*$', re.IGNORECASE)
+# Shorter audits are scanned in-process; a pool costs more than it saves
+PARALLEL_MIN_PAGES = 8
+
+class UnreadablePdf(ValueError):
+    """The bytes are not a PDF that pdfplumber can open"""
+
 
 def extract_text_from_pdf(pdf_path):
     with pdfplumber.open(pdf_path) as pdf:
-        text = ""
-        for page in pdf.pages:
-            text += page.extract_text()
-    return text
+        return "\n".join(page.extract_text() or "" for page in pdf.pages)
+
+def _scan_page(pdf, index: int) -> str:
+    page = pdf.pages[index]
+    # The plain character dump (pdfplumber 0.10+) is far cheaper than layout-aware
+    # extraction and is enough to tell that a page has no requirement blocks
+    extract_text_simple = getattr(page, 'extract_text_simple', None)
+    if extract_text_simple is not None:
+        text = extract_text_simple() or ""
+        if "still needed" not in text.lower():
+            return text
+    return page.extract_text() or ""
+
+def _scan_pages(pdf_bytes: bytes, indices: range) -> List[str]:
+    """Pool task: one contiguous run of pages, so each worker opens the PDF once per upload"""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        return [_scan_page(pdf, index) for index in indices]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _page_pool() -> ProcessPoolExecutor:
+    """The process's one page pool, started on first use and reused by every upload.
+
+    Workers are spawned rather than forked, as the service and Streamlit
+    run threads that a fork would copy mid-flight.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def _iter_page_texts(pdf_bytes: bytes, page_count: int, workers: int) -> Iterator[str]:
+    global _pool
+    if page_count >= PARALLEL_MIN_PAGES and workers > 1:
+        pool = _page_pool()
+        chunk = -(-page_count // workers)
+        try:
+            for texts in pool.map(_scan_pages, itertools.repeat(pdf_bytes),
+                                  [range(start, min(start + chunk, page_count))
+                                   for start in range(0, page_count, chunk)]):
+                yield from texts
+            return
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory); the next upload starts a new pool
+            logger.warning("PDF page pool broke; scanning in-process")
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+    yield from _scan_pages(pdf_bytes, range(page_count))
+
+def _is_cut_off(line: str) -> bool:
+    """A "Still needed:" label with nothing after it, which a page break has cut"""
+    return bool(_CUT_OFF.search(line))
+
+def iter_page_scans(pdf_bytes: bytes, workers: Optional[int] = None) -> Iterator[Tuple[str, List[str]]]:
+    """Yield (page text, still-needed matches) for every page, in page order.
+
+    Pages of long audits are extracted on a shared process pool and streamed
+    back in order; pages without "Still needed" are skipped after a cheap
+    check. A page's last line that is a "Still needed" cut off before its
+    courses is matched together with the first line of the next page.
+    """
+    try:
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            page_count = len(pdf.pages)
+    except Exception as e:
+        # pdfminer raises its own syntax errors, which pdfplumber versions wrap differently
+        raise UnreadablePdf(f"not a readable PDF: {e}") from e
+    workers = min(workers or os.cpu_count() or 1, page_count)
+    carried = ""
+    for number, text in enumerate(_iter_page_texts(pdf_bytes, page_count, workers), 1):
+        scanned = f"{carried} {text}" if carried else text
+        carried = ""
+        last_line = scanned.rsplit("\n", 1)[-1]
+        if number < page_count and _is_cut_off(last_line):
+            carried = last_line.strip()
+            scanned = scanned[:len(scanned) - len(last_line)]
+        yield text, STILL_NEEDED_PATTERN.findall(scanned)
+
+def parse_degreeworks_pdf(pdf_source: Union[str, bytes]):
+    """Parse a DegreeWorks audit given as a file path or as the uploaded PDF bytes.
+
+    Results are cached on disk by the SHA-256 of the PDF, so a repeat upload
+    of the same audit skips PDF parsing entirely.
+    """
+    if isinstance(pdf_source, (bytes, bytearray)):
+        pdf_bytes = bytes(pdf_source)
+    else:
+        with open(pdf_source, 'rb') as file:
+            pdf_bytes = file.read()
+    with span('pdf_extract', bytes=len(pdf_bytes)) as extract_span:
+        key = cache_key(pdf_bytes)
+        cached = load_cached(key)
+        extract_span.count('cache_hits', cached is not None)
+        if cached is not None:
+            return cached
+
+        # Parsed from memory, so concurrent uploads never share a file. The
+        # "Still Needed" sections are collected page by page as pages arrive.
+        page_texts = []
+        still_needed_matches = []
+        for page_text, matches in iter_page_scans(pdf_bytes):
+            page_texts.append(page_text)
+            still_needed_matches.extend(matches)
+            extract_span.count('pages')
+            extract_span.count('requirement_pages', bool(matches))
+        full_text = "\n".join(page_texts)
 
-def parse_degreeworks_pdf(pdf_path):
-    full_text = extract_text_from_pdf(pdf_path)
-    
     #print("Debug: Full text extracted from PDF")
     #print(f"Debug: Full text length: {len(full_text)}")
     
-    # Extract the "Still Needed" sections
-    still_needed_matches = re.findall(r'Still needed:\s*(\d+.*?)(?:\n|$)', full_text, re.IGNORECASE | re.MULTILINE)
-    
     if still_needed_matches:
         #print("Debug: Found 'Still Needed' sections")
         #for match in still_needed_matches:
@@ -31,10 +151,12 @@ def parse_degreeworks_pdf(pdf_path):
 
     #print(f"Debug: Parsed still needed courses: {still_needed_courses}")
 
-    return {
+    result = {
         "full_text": full_text,
         "still_needed_courses": still_needed_courses
     }
+    store_cached(key, result)
+    return result
 
 # Example usage
 # if __name__ == "__main__":
@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from data_preprocessing import Course
+from schedule_metrics import ScheduleScore, as_schedule_score
+from schedule_solver import (Branch, Requirement, SearchPlan, credit_bands, rank_nearest_schedules, rank_plan,
+                             score_representatives)
+
+# Per-worker search state, set once by _start_worker instead of shipped with every branch
+_worker = {}
+
+
+def _section_key(score: ScheduleScore):
+    return lambda unit: score(list(unit.sections))
+
+
+def _start_worker(course_groups: List[List[Course]], score: ScheduleScore, shared_bound,
+                  requirements: Sequence[Requirement] = ()) -> None:
+    # Rebuilding the plan from the same groups gives the same section positions as the parent
+    _worker['plan'] = SearchPlan(course_groups, section_key=_section_key(score), requirements=requirements)
+    _worker['score'] = score
+    _worker['bound'] = shared_bound
+
+
+def _rank_branch(branch: Branch, min_credits: float, max_credits: float,
+                 k: int) -> List[Tuple[float, int, List[int]]]:
+    plan = _worker['plan']
+    score = _worker['score']
+    shared_bound = _worker['bound']
+
+    def publish(value: float) -> None:
+        # This branch's k-th best is an upper bound on the overall k-th best
+        with shared_bound.get_lock():
+            if value < shared_bound.value:
+                shared_bound.value = value
+
+    # Course objects do not survive the trip back with their identity, so positions are returned
+    return rank_plan(plan, min_credits, max_credits, k, score, branch,
+                     outer_bound=lambda: shared_bound.value, on_bound=publish)
+
+
+class _RankingPool:
+    """A process pool whose workers hold one set of course groups, ranking one credit window at a time.
+
+    Starting the workers and shipping them the groups is paid once, however
+    many windows are ranked.
+    """
+
+    def __init__(self, course_groups: Sequence[Sequence[Course]], score: Optional[ScheduleScore] = None,
+                 workers: Optional[int] = None, requirements: Sequence[Requirement] = ()):
+        self.score = as_schedule_score(score)
+        representatives = score_representatives(course_groups, self.score)
+        self.plan = SearchPlan(representatives, section_key=_section_key(self.score), requirements=requirements)
+        self._shared_bound = multiprocessing.Value('d', float('inf'))
+        self._pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_start_worker,
+                                         initargs=(representatives, self.score, self._shared_bound, requirements))
+
+    def __enter__(self) -> '_RankingPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._pool.shutdown()
+
+    def rank(self, min_credits: float, max_credits: float, k: int, split_depth: int = 2) -> List[List[Course]]:
+        if k <= 0:
+            return []
+        # The k-th best of another window says nothing about this one
+        with self._shared_bound.get_lock():
+            self._shared_bound.value = float('inf')
+        futures = [self._pool.submit(_rank_branch, branch, min_credits, max_credits, k)
+                   for branch in self.plan.branches(split_depth)]
+        merged = []
+        for branch_index, future in enumerate(futures):
+            for value, order, positions in future.result():
+                merged.append((value, branch_index, order, positions))
+        merged.sort(key=lambda entry: entry[:3])
+        return [self.plan.expand(positions) for _, _, _, positions in merged[:k]]
+
+
+def parallel_rank_schedules(course_groups: Sequence[Sequence[Course]], min_credits: float, max_credits: float,
+                            k: int, score: Optional[ScheduleScore] = None, workers: Optional[int] = None,
+                            split_depth: int = 2, requirements: Sequence[Requirement] = ()) -> List[List[Course]]:
+    """rank_schedules spread over a process pool, searched to the end as by rank_schedules(budget=None).
+
+    The tree is split into disjoint branches by the choice for the first
+    ``split_depth`` courses. Every worker prunes against its own k best and
+    against a shared k-th best score, and the per-branch results are merged
+    by (score, branch, found order), which is the serial search order, so
+    the result is exactly the serial one. There is no node budget.
+    ``score`` must be picklable (a ScheduleScore or a module-level function).
+    """
+    if k <= 0:
+        return []
+    with _RankingPool(course_groups, score, workers, requirements) as pool:
+        return pool.rank(min_credits, max_credits, k, split_depth)
+
+
+def parallel_rank_nearest_schedules(course_groups: Sequence[Sequence[Course]], desired_credits: float,
+                                    tolerance: float, k: int, score: Optional[ScheduleScore] = None,
+                                    workers: Optional[int] = None,
+                                    requirements: Sequence[Requirement] = ()) -> List[List[Course]]:
+    """rank_nearest_schedules with each credit band ranked as by parallel_rank_schedules, on one pool"""
+    ranked: List[List[Course]] = []
+    with _RankingPool(course_groups, score, workers, requirements) as pool:
+        for credits in credit_bands(desired_credits, tolerance):
+            if len(ranked) >= k:
+                break
+            if credits > 0:
+                ranked.extend(pool.rank(credits, credits, k - len(ranked)))
+    return ranked
+
+
+def main():
+    # Serial vs parallel on the largest courses in the catalog
+    from catalog import get_catalog
+    catalog = get_catalog()
+    course_groups = sorted((list(sections) for numbers in catalog.courses.values() for sections in numbers.values()
+                            if all(section.slots for section in sections)), key=len, reverse=True)[:18]
+    print(f"{len(course_groups)} courses, {sum(map(len, course_groups))} sections, {os.cpu_count()} CPUs")
+    for desired_credits in (12, 15, 18):
+        start = time.perf_counter()
+        serial = rank_nearest_schedules(course_groups, desired_credits, 3, 4, budget=None)
+        serial_time = time.perf_counter() - start
+        start = time.perf_counter()
+        parallel = parallel_rank_nearest_schedules(course_groups, desired_credits, 3, 4)
+        parallel_time = time.perf_counter() - start
+        same = [[s.crn for s in x] for x in serial] == [[s.crn for s in x] for x in parallel]
+        print(f"{desired_credits} credits: serial {serial_time:.3f}s, parallel {parallel_time:.3f}s, "
+              f"speedup {serial_time / parallel_time:.2f}x, identical results: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from tracing import logger
+
+CACHE_DIRECTORY = '.degreeworks_cache'
+MAX_CACHE_BYTES = 64 << 20
+# Bump whenever parse_degreeworks_pdf's result changes, so entries of an older parser are never served;
+# they are left for eviction. 2: full_text mixes simple and layout-aware page text. 3: "Still needed"
+# lines cut off by a page break are completed from the next page. 4: only a bare "Still needed:" label counts
+# as cut off.
+PARSER_VERSION = 4
+
+
+def cache_key(pdf_bytes: bytes) -> str:
+    """SHA-256 of the PDF, so the same audit hits the same entry whatever it was uploaded as, and the parser version"""
+    return f"{hashlib.sha256(pdf_bytes).hexdigest()}-v{PARSER_VERSION}"
+
+
+def _entry_path(directory: str, key: str) -> str:
+    return os.path.join(directory, f"{key}.json")
+
+
+def load_cached(key: str, directory: str = CACHE_DIRECTORY) -> Optional[Dict]:
+    """Return the cached parse result for key, or None, marking it most recently used"""
+    path = _entry_path(directory, key)
+    try:
+        with open(path, 'r') as file:
+            result = json.load(file)
+        # The mtime is the LRU clock
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return result
+
+
+def store_cached(key: str, result: Dict, directory: str = CACHE_DIRECTORY,
+                 max_bytes: int = MAX_CACHE_BYTES) -> None:
+    """Atomically write result for key, then evict least recently used entries over max_bytes"""
+    path = _entry_path(directory, key)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temp_path, 'w') as file:
+            json.dump(result, file)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning("Could not write parse cache entry %s: %s", path, e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return
+    _evict(directory, max_bytes)
+
+
+def _evict(directory: str, max_bytes: int) -> None:
+    entries = []
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, filename))
+        except OSError:
+            # Evicted by another process meanwhile
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, filename))
+    total = sum(size for _, size, _ in entries)
+    for _, size, filename in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, filename))
+        except OSError:
+            pass
+        total -= size
@@ -0,0 +1,102 @@
+"""Score many schedules at once with the metrics of schedule_metrics.
+
+A ScheduleBatch turns each section into a row of per-section arrays once;
+a batch of schedules is then a 2-D array of row indices, padded with -1,
+and every metric is a gather followed by a sum over its sections. The
+results match analyze_schedule_distribution and calculate_stress_level
+schedule for schedule.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from data_preprocessing import Course, DAY_BITS
+from schedule_metrics import MAX_BLOCK_HOURS, MAX_DAILY_CREDITS, MAX_TERM_CREDITS, block_hours, weekly_hours
+
+# Columns of daily_load, in Course.day_mask bit order
+DAY_ORDER = tuple(DAY_BITS)
+TIME_BLOCKS = ('morning', 'afternoon', 'evening')
+
+# (credit, daily, time block) weights of each view, as in calculate_stress_level
+_VIEW_WEIGHTS = {'week': (0.4, 0.4, 0.2), 'month': (0.6, 0.2, 0.2)}
+_WEEKDAY_COLUMNS = {'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3, 'Fri': 4}
+
+
+class ScheduleBatch:
+    """Per-section metric arrays for a fixed set of sections, indexed by CRN"""
+
+    def __init__(self, sections: Iterable[Course]):
+        self.sections = list({section.crn: section for section in sections}.values())
+        self.rows = {section.crn: row for row, section in enumerate(self.sections)}
+        # One extra all-zero row, which the -1 padding of shorter schedules selects
+        count = len(self.sections) + 1
+        self.credits = np.zeros(count)
+        self.days = np.zeros((count, len(DAY_ORDER)))
+        self.block_hours = np.zeros((count, len(TIME_BLOCKS)))
+        self.weekly_hours = np.zeros(count)
+        for row, section in enumerate(self.sections):
+            self.credits[row] = section.credits or 3
+            self.days[row] = [section.day_mask >> column & 1 for column in range(len(DAY_ORDER))]
+            # Every timed meeting counts, not only the first
+            self.block_hours[row] = block_hours(section)
+            self.weekly_hours[row] = weekly_hours(section)
+
+    @classmethod
+    def from_schedules(cls, schedules: Sequence[Sequence[Course]]) -> 'ScheduleBatch':
+        return cls(section for schedule in schedules for section in schedule)
+
+    def indices(self, schedules: Sequence[Sequence[Course]]) -> np.ndarray:
+        """The schedules as an (n, longest) array of rows, padded with -1"""
+        width = max(map(len, schedules), default=0)
+        indices = np.full((len(schedules), width), -1, dtype=np.intp)
+        for number, schedule in enumerate(schedules):
+            indices[number, :len(schedule)] = [self.rows[section.crn] for section in schedule]
+        return indices
+
+    def analyze(self, indices: np.ndarray) -> Dict[str, np.ndarray]:
+        """analyze_schedule_distribution of every row of indices.
+
+        daily_load is (n, 7) in DAY_ORDER, time_blocks (n, 3) in TIME_BLOCKS
+        order, total_hours and total_credits are (n,).
+        """
+        credits = self.credits[indices]
+        return {
+            'daily_load': np.einsum('ij,ijk->ik', credits, self.days[indices]),
+            'time_blocks': self.block_hours[indices].sum(axis=1),
+            'total_hours': self.weekly_hours[indices].sum(axis=1),
+            'total_credits': credits.sum(axis=1),
+        }
+
+    def stress_components(self, analysis: Dict[str, np.ndarray]) -> np.ndarray:
+        """(n, 3) credit, daily and time block stress, as schedule_metrics.stress_components"""
+        return np.column_stack((
+            analysis['total_credits'] / MAX_TERM_CREDITS * 100,
+            analysis['daily_load'].max(axis=1, initial=0) / MAX_DAILY_CREDITS * 100,
+            analysis['time_blocks'].max(axis=1, initial=0) / MAX_BLOCK_HOURS * 100,
+        ))
+
+    def stress_levels(self, indices: np.ndarray, view_type: str = 'week',
+                      analysis: Optional[Dict[str, np.ndarray]] = None,
+                      today: Optional[datetime] = None) -> np.ndarray:
+        """calculate_stress_level of every row of indices, capped at 100"""
+        if analysis is None:
+            analysis = self.analyze(indices)
+        if view_type == 'day':
+            # Weekends show Monday, like the single schedule view
+            column = _WEEKDAY_COLUMNS.get((today or datetime.now()).strftime('%a'), 0)
+            levels = analysis['daily_load'][:, column] / MAX_DAILY_CREDITS * 100
+        else:
+            weights = _VIEW_WEIGHTS.get(view_type, _VIEW_WEIGHTS['month'])
+            levels = self.stress_components(analysis) @ np.array(weights)
+        return np.minimum(levels, 100)
+
+    def rank(self, indices: np.ndarray, view_type: str = 'week') -> np.ndarray:
+        """Row numbers of indices from least to most stressful, ties in their given order"""
+        return np.argsort(self.stress_levels(indices, view_type), kind='stable')
+
+
+def stress_levels(schedules: Sequence[Sequence[Course]], view_type: str = 'week') -> np.ndarray:
+    """calculate_stress_level of each schedule, in one batch"""
+    batch = ScheduleBatch.from_schedules(schedules)
+    return batch.stress_levels(batch.indices(schedules), view_type)
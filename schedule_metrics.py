@@ -0,0 +1,167 @@
+from collections import defaultdict
+from datetime import datetime
+
+# Loads at which each stress component reaches 100%
+MAX_TERM_CREDITS = 18
+MAX_DAILY_CREDITS = 9
+MAX_BLOCK_HOURS = 3
+
+_BLOCK_INDEX = {'morning': 0, 'afternoon': 1, 'evening': 2}
+
+def time_block(hour):
+    return "morning" if hour < 12 else "afternoon" if hour < 17 else "evening"
+
+def block_hours(course):
+    """Class hours in each time block, as [morning, afternoon, evening], summed over the course's meetings"""
+    hours = [0, 0, 0]
+    for _, begin_minutes, end_minutes in course.meeting_minutes:
+        for hour in range(begin_minutes // 60, end_minutes // 60):
+            hours[_BLOCK_INDEX[time_block(hour)]] += 1
+    return hours
+
+def weekly_hours(course):
+    """Class hours in a week, over every meeting of the course"""
+    return sum((end_minutes // 60 - begin_minutes // 60) * bin(day_mask).count('1')
+               for day_mask, begin_minutes, end_minutes in course.meeting_minutes)
+
+def analyze_schedule_distribution(schedule):
+    """Analyze the distribution of classes across days and times"""
+    daily_load = defaultdict(int)
+    time_blocks = defaultdict(int)
+    total_hours = 0
+    
+    for course in schedule:
+        # Count the credits for daily load on every day the course meets, timed or not
+        for day in course.days or '':
+            daily_load[day] += course.credits or 3
+
+        # Time blocks and hours come from every timed meeting, so a lab or evening session counts too
+        for block, hours in zip(_BLOCK_INDEX, block_hours(course)):
+            if hours:
+                time_blocks[block] += hours
+        total_hours += weekly_hours(course)
+
+    return {
+        'daily_load': daily_load,
+        'time_blocks': time_blocks,
+        'total_hours': total_hours
+    }
+
+def stress_components(schedule, analysis=None):
+    """Return (credit_stress, daily_stress, time_block_stress) as percentages.
+
+    Each component only grows when a course is added to the schedule.
+    """
+    if analysis is None:
+        analysis = analyze_schedule_distribution(schedule)
+    total_credits = sum(course.credits or 3 for course in schedule)
+    credit_stress = (total_credits / MAX_TERM_CREDITS) * 100
+    daily_stress = (max(analysis['daily_load'].values(), default=0) / MAX_DAILY_CREDITS) * 100
+    time_block_stress = max(analysis['time_blocks'].values(), default=0) / MAX_BLOCK_HOURS * 100
+    return credit_stress, daily_stress, time_block_stress
+
+def stress_score(schedule):
+    """Uncapped week-view stress, used to rank candidate schedules (lower is better).
+
+    It never decreases as courses are added, so the score of a partial
+    schedule is an admissible lower bound for every schedule extending it.
+    """
+    credit_stress, daily_stress, time_block_stress = stress_components(schedule)
+    return credit_stress * 0.4 + daily_stress * 0.4 + time_block_stress * 0.2
+
+def calculate_stress_level(schedule, view_type='week', analysis=None):
+    """Calculate stress level based on schedule distribution and view type"""
+    if analysis is None:
+        analysis = analyze_schedule_distribution(schedule)
+    credit_stress, daily_stress, time_block_stress = stress_components(schedule, analysis)
+    
+    # Calculate view-specific stress
+    if view_type == 'day':
+        # For day view, emphasize that day's specific load
+        today = datetime.now().strftime('%a')
+        day_map = {'Mon': 'M', 'Tue': 'T', 'Wed': 'W', 'Thu': 'R', 'Fri': 'F'}
+        today_load = analysis['daily_load'].get(day_map.get(today, 'M'), 0)
+        stress_level = (today_load / MAX_DAILY_CREDITS) * 100
+    elif view_type == 'week':
+        # For week view, balance daily distribution and total load
+        stress_level = (credit_stress * 0.4 + daily_stress * 0.4 + time_block_stress * 0.2)
+    else:  # month view
+        # For month view, emphasize total credit load and distribution
+        stress_level = (credit_stress * 0.6 + daily_stress * 0.2 + time_block_stress * 0.2)
+    
+    return min(stress_level, 100)  # Cap at 100%
+
+class ScheduleScore:
+    """Cost of a schedule for ranked search (lower is better).
+
+    ``bound(partial, min_credits)`` must never exceed the score of a schedule
+    that extends ``partial`` and has at least ``min_credits``; the default
+    reuses the score itself, which is admissible whenever adding a section
+    never lowers it. Choice units (a section or a SectionBundle) with the
+    same ``equivalence_key`` must be interchangeable for both the score and
+    conflicts, so the search only has to try one of them.
+    """
+
+    def __call__(self, schedule):
+        raise NotImplementedError
+
+    def bound(self, partial, min_credits):
+        return self(partial)
+
+    def equivalence_key(self, section):
+        return section
+
+class FunctionScore(ScheduleScore):
+    """Adapts a plain ``schedule -> float`` function that never decreases as sections are added"""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, schedule):
+        return self.function(schedule)
+
+class StressScore(ScheduleScore):
+    """stress_score with a bound that charges the credits still missing up front"""
+
+    def __init__(self):
+        # Per-section (credits, day indexes, hours per time block), keyed by the Course itself
+        self._profiles = {}
+
+    def _profile(self, course):
+        profile = self._profiles.get(course)
+        if profile is None:
+            days = tuple(index for index in range(7) if course.day_mask >> index & 1)
+            profile = self._profiles[course] = (course.credits or 3, days, tuple(block_hours(course)))
+        return profile
+
+    def bound(self, partial, min_credits):
+        total_credits = 0
+        daily_load = [0] * 7
+        morning = afternoon = evening = 0
+        for course in partial:
+            credits, days, hours = self._profile(course)
+            total_credits += credits
+            for day in days:
+                daily_load[day] += credits
+            morning += hours[0]
+            afternoon += hours[1]
+            evening += hours[2]
+        # Every schedule in the window carries at least min_credits of credit stress
+        credit_stress = (max(total_credits, min_credits) / MAX_TERM_CREDITS) * 100
+        daily_stress = (max(daily_load) / MAX_DAILY_CREDITS) * 100
+        time_block_stress = max(morning, afternoon, evening) / MAX_BLOCK_HOURS * 100
+        return credit_stress * 0.4 + daily_stress * 0.4 + time_block_stress * 0.2
+
+    def __call__(self, schedule):
+        return self.bound(schedule, 0)
+
+    def equivalence_key(self, section):
+        # Bundles are equivalent when their members are, member by member
+        return tuple((member.meeting_blocks,) + self._profile(member) for member in section.sections)
+
+def as_schedule_score(score):
+    if score is None:
+        return StressScore()
+    if isinstance(score, ScheduleScore):
+        return score
+    return FunctionScore(score)
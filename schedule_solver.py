@@ -0,0 +1,412 @@
+import contextvars
+import heapq
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from data_preprocessing import Course, blocks_conflict
+from schedule_metrics import ScheduleScore, as_schedule_score
+from tracing import current_span, logger
+
+
+class SearchCancelled(Exception):
+    """Raised out of a search whose cancel event (see set_cancel_event) was set"""
+
+
+# Checked every CANCEL_CHECK_NODES nodes by every search running in this context
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar('cancel_event',
+                                                                                       default=None)
+CANCEL_CHECK_NODES = 1024
+# Partial schedules a ranked search scores per credit band before it settles for the best found so
+# far; about a second on the largest courses of the catalog, where the full search takes minutes
+RANK_NODE_BUDGET = 150_000
+
+
+def set_cancel_event(event: Optional[threading.Event]) -> None:
+    """Make searches in this context stop with SearchCancelled once event is set"""
+    _cancel_event.set(event)
+
+
+def courses_overlap(course1: Course, course2: Course) -> bool:
+    # The weekly union rules out most pairs before any date range is looked at
+    return bool(course1.slots & course2.slots) and blocks_conflict(course1.meeting_blocks, course2.meeting_blocks)
+
+
+class ConflictMatrix:
+    """Pairwise conflicts between a fixed set of sections, as packed adjacency bitsets.
+
+    Bit j of ``rows[i]`` is set when any meetings of sections i and j share a
+    time slot on overlapping dates. It is built once per student, so every
+    later solve (a different credit target, say) only tests bits.
+    """
+
+    def __init__(self, sections: Sequence[Course]):
+        # Courses compare by identity, so this drops repeats and keeps order
+        self.sections = tuple(dict.fromkeys(sections))
+        self._positions = {id(section): i for i, section in enumerate(self.sections)}
+
+        # Sections sharing a meeting pattern share a row; compare patterns, not sections
+        members_by_pattern: Dict[tuple, int] = defaultdict(int)
+        union_by_pattern: Dict[tuple, int] = {}
+        for i, section in enumerate(self.sections):
+            if section.slots:
+                members_by_pattern[section.meeting_blocks] |= 1 << i
+                union_by_pattern[section.meeting_blocks] = section.slots
+        row_by_pattern = {}
+        for pattern, union in union_by_pattern.items():
+            row = 0
+            for other, members in members_by_pattern.items():
+                if union & union_by_pattern[other] and blocks_conflict(pattern, other):
+                    row |= members
+            row_by_pattern[pattern] = row
+        self.rows = [row_by_pattern.get(section.meeting_blocks, 0) for section in self.sections]
+
+    def position(self, section: Course) -> int:
+        return self._positions[id(section)]
+
+    def conflicts(self, section1: Course, section2: Course) -> bool:
+        return bool(self.rows[self.position(section1)] >> self.position(section2) & 1)
+
+
+# A subtree of the search: (group index, section position). Groups before the
+# index are left out; the section is taken from that group, or, when it is
+# None, the search continues freely from the index.
+Branch = Tuple[int, Optional[int]]
+
+# A "choose N of" requirement: (indices into course_groups, most courses to take)
+Requirement = Tuple[Sequence[int], int]
+
+
+class SearchPlan:
+    """Course groups in search order, as section positions in a ConflictMatrix.
+
+    ``course_groups`` holds the alternative sections of each course; a schedule
+    takes at most one section per course. A group may also hold
+    SectionBundles, which are chosen (and conflict) as a whole. The search is
+    a depth-first backtrack over (course, section) choices that cuts a branch
+    as soon as it exceeds max_credits or conflicts, and skips it when even
+    taking the largest section of every remaining course cannot reach
+    min_credits.
+
+    ``requirements`` caps how many courses a schedule takes from each
+    "choose N of" group; once a group has its N, its other courses are only
+    ever left out, and the credit bound counts just the N largest of them.
+    A course listed in several groups counts against each.
+
+    The courses at indices in ``required`` are never left out: every
+    schedule takes one of their sections. They are searched first, so a
+    required course with no section that fits cuts the tree at the root.
+
+    Conflicts come from ``matrix``, which must cover every section in
+    course_groups; the sections ruled out by the current choices are kept as
+    one bitset, so testing a candidate is a single AND. ``section_key``
+    orders the sections tried for each course.
+    """
+
+    def __init__(self, course_groups: Sequence[Sequence[Course]], matrix: Optional[ConflictMatrix] = None,
+                 section_key: Optional[Callable[[Course], float]] = None,
+                 requirements: Sequence[Requirement] = (), required: Sequence[int] = ()):
+        if matrix is None:
+            matrix = ConflictMatrix([section for sections in course_groups for section in sections])
+        self.matrix = matrix
+        self.sections = matrix.sections
+        self.credits_of = [section.credits for section in self.sections]
+
+        # Only requirements that can actually be exceeded constrain the search
+        requirements_of = defaultdict(list)
+        self.limits: List[int] = []
+        for indices, limit in requirements:
+            indices = {index for index in indices if course_groups[index]}
+            if limit < len(indices):
+                for index in indices:
+                    requirements_of[index].append(len(self.limits))
+                self.limits.append(limit)
+
+        # A required course without sections rules out every schedule
+        required = set(required)
+        self.feasible = all(course_groups[index] for index in required)
+        # Required courses first, then large ones, so the credit bounds bite near the root
+        order = sorted((index for index, group in enumerate(course_groups) if group),
+                       key=lambda index: (index not in required,
+                                          -max(self.credits_of[matrix.position(section)]
+                                               for section in course_groups[index])))
+        groups = [[matrix.position(section) for section in dict.fromkeys(course_groups[index])] for index in order]
+        if section_key is not None:
+            groups = [sorted(group, key=lambda i: section_key(self.sections[i])) for group in groups]
+        self.groups = groups
+        self.requirements_of = [tuple(requirements_of[index]) for index in order]
+        self.required = [index in required for index in order]
+
+        # reachable[i]: most credits obtainable from groups[i:]
+        most = [max(self.credits_of[j] for j in group) for group in groups]
+        self.reachable = [0] * (len(groups) + 1)
+        for i in range(len(groups) - 1, -1, -1):
+            free = 0
+            capped = defaultdict(list)
+            for g in range(i, len(groups)):
+                if len(self.requirements_of[g]) == 1:
+                    capped[self.requirements_of[g][0]].append(most[g])
+                else:
+                    # Courses in several groups are bounded loosely, which is still an upper bound
+                    free += most[g]
+            self.reachable[i] = free + sum(sum(sorted(credits, reverse=True)[:self.limits[r]])
+                                           for r, credits in capped.items())
+
+    def branches(self, depth: int) -> List[Branch]:
+        """Split the tree into disjoint subtrees, listed in the order a full search visits them"""
+        depth = min(depth, len(self.groups))
+        branches: List[Branch] = []
+        for index in range(depth):
+            branches.extend((index, i) for i in self.groups[index])
+            if self.required[index]:
+                # Every schedule takes one of this course's sections, so nothing leaves it out
+                return branches
+        branches.append((depth, None))
+        return branches
+
+    def expand(self, positions: Sequence[int]) -> List[Course]:
+        """The sections registered for a list of unit positions, bundles unpacked"""
+        return [section for i in positions for section in self.sections[i].sections]
+
+    def search_positions(self, min_credits: float, max_credits: float,
+                         prune: Optional[Callable[[List[Course]], bool]] = None,
+                         branch: Optional[Branch] = None) -> Iterator[List[int]]:
+        """Yield the unit positions of every schedule search() yields.
+
+        Nodes explored and branches pruned are added to the current tracing
+        span whenever a schedule is yielded and when the search ends.
+        """
+        rows = self.matrix.rows
+        credits_of = self.credits_of
+        groups = self.groups
+        reachable = self.reachable
+        requirements_of = self.requirements_of
+        required = self.required
+        limits = self.limits
+        expand = self.expand
+        chosen: List[int] = []
+        # Courses taken so far from each requirement
+        taken = [0] * len(limits)
+        # Nodes explored and branches pruned since the last flush
+        stats = [0, 0]
+        cancel = _cancel_event.get()
+
+        def flush() -> None:
+            current = current_span()
+            current.count('nodes', stats[0])
+            current.count('pruned', stats[1])
+            stats[0] = stats[1] = 0
+
+        def take(index: int, delta: int) -> None:
+            for r in requirements_of[index]:
+                taken[r] += delta
+
+        def extend(index: int, credits: float, blocked: int) -> Iterator[List[int]]:
+            stats[0] += 1
+            if cancel is not None and not stats[0] % CANCEL_CHECK_NODES and cancel.is_set():
+                raise SearchCancelled()
+            if credits + reachable[index] < min_credits:
+                stats[1] += 1
+                return
+            if index == len(groups):
+                if chosen:
+                    yield list(chosen)
+                return
+            if all(taken[r] < limits[r] for r in requirements_of[index]):
+                take(index, 1)
+                for i in groups[index]:
+                    total = credits + credits_of[i]
+                    if total > max_credits:
+                        continue
+                    if blocked >> i & 1:
+                        continue
+                    chosen.append(i)
+                    if prune is None or not prune(expand(chosen)):
+                        yield from extend(index + 1, total, blocked | rows[i])
+                    else:
+                        stats[1] += 1
+                    chosen.pop()
+                take(index, -1)
+            if not required[index]:
+                # Leave this course out of the schedule
+                yield from extend(index + 1, credits, blocked)
+
+        def walk() -> Iterator[List[int]]:
+            if not self.feasible:
+                return
+            if branch is None:
+                yield from extend(0, 0, 0)
+                return
+            index, i = branch
+            if i is None:
+                yield from extend(index, 0, 0)
+            elif credits_of[i] <= max_credits and all(limits[r] > 0 for r in requirements_of[index]):
+                chosen.append(i)
+                take(index, 1)
+                if prune is None or not prune(expand(chosen)):
+                    yield from extend(index + 1, credits_of[i], rows[i])
+
+        try:
+            for positions in walk():
+                flush()
+                yield positions
+        finally:
+            flush()
+
+    def search(self, min_credits: float, max_credits: float,
+               prune: Optional[Callable[[List[Course]], bool]] = None,
+               branch: Optional[Branch] = None) -> Iterator[List[Course]]:
+        """Yield conflict-free schedules in [min_credits, max_credits], optionally within one branch.
+
+        ``prune`` is called with each partial schedule as it grows and drops
+        the whole branch when it returns True. Schedules and partial
+        schedules are lists of sections, with every bundle unpacked.
+        """
+        for positions in self.search_positions(min_credits, max_credits, prune, branch):
+            yield self.expand(positions)
+
+
+def search_schedules(course_groups: Sequence[Sequence[Course]], min_credits: float,
+                     max_credits: float, matrix: Optional[ConflictMatrix] = None,
+                     prune: Optional[Callable[[List[Course]], bool]] = None,
+                     section_key: Optional[Callable[[Course], float]] = None,
+                     requirements: Sequence[Requirement] = ()) -> Iterator[List[Course]]:
+    """Yield conflict-free schedules whose credits fall in [min_credits, max_credits].
+
+    See SearchPlan for how the search runs. Pass the same matrix to repeated
+    searches to avoid rebuilding it.
+    """
+    return SearchPlan(course_groups, matrix, section_key, requirements).search(min_credits, max_credits, prune)
+
+
+def score_representatives(course_groups: Sequence[Sequence[Course]], score: ScheduleScore) -> List[List[Course]]:
+    """Keep the first section of each score equivalence class in every group"""
+    representatives = []
+    for group in course_groups:
+        by_key = {}
+        for section in group:
+            by_key.setdefault(score.equivalence_key(section), section)
+        representatives.append(list(by_key.values()))
+    return representatives
+
+
+def rank_plan(plan: SearchPlan, min_credits: float, max_credits: float, k: int, score: ScheduleScore,
+              branch: Optional[Branch] = None,
+              outer_bound: Callable[[], float] = lambda: float('inf'),
+              on_bound: Optional[Callable[[float], None]] = None,
+              budget: Optional[int] = None) -> List[Tuple[float, int, List[int]]]:
+    """Branch and bound for the k best (score, found_order, positions) in plan or one of its branches.
+
+    ``positions`` are unit positions in the plan; plan.expand turns them
+    into the schedule.
+
+    Partial schedules are cut when their bound reaches the worst of k kept
+    schedules, or exceeds ``outer_bound()``, a k-th best score known from
+    elsewhere (another worker's branch, say). Ties with the outer bound are
+    kept so a merged result does not depend on timing. ``on_bound`` is told
+    every time the local k-th best score improves.
+
+    With a ``budget``, at most that many partial schedules are scored; after
+    that every branch is cut, so the search unwinds at once and returns the
+    best schedules found so far, which need not be the k best.
+    """
+    # Max-heap of (-score, -found_order, positions): the root is the one to evict
+    kept = []
+    scored = [0]
+
+    def prune(partial: List[Course]) -> bool:
+        scored[0] += 1
+        if budget is not None and scored[0] > budget:
+            return True
+        bound = score.bound(partial, min_credits)
+        return (len(kept) == k and bound >= -kept[0][0]) or bound > outer_bound()
+
+    for order, positions in enumerate(plan.search_positions(min_credits, max_credits, prune, branch)):
+        value = score(plan.expand(positions))
+        if len(kept) < k:
+            heapq.heappush(kept, (-value, -order, positions))
+        elif value < -kept[0][0]:
+            heapq.heapreplace(kept, (-value, -order, positions))
+        else:
+            continue
+        if on_bound is not None and len(kept) == k:
+            on_bound(-kept[0][0])
+    if budget is not None and scored[0] > budget:
+        current_span().count('budget_spent')
+        logger.info("Ranked search stopped after %d partial schedules; keeping the best %d found",
+                    budget, len(kept))
+    return sorted((-value, -order, positions) for value, order, positions in kept)
+
+
+def rank_schedules(course_groups: Sequence[Sequence[Course]], min_credits: float, max_credits: float,
+                   k: int, score: Optional[ScheduleScore] = None,
+                   matrix: Optional[ConflictMatrix] = None,
+                   requirements: Sequence[Requirement] = (),
+                   budget: Optional[int] = RANK_NODE_BUDGET) -> List[List[Course]]:
+    """Return the k lowest-scoring schedules in the credit window, best first.
+
+    Branch and bound over the backtracking search: once k schedules are
+    kept, any partial schedule whose ``score.bound`` reaches the worst of
+    them is cut together with every extension. ``score`` defaults to
+    StressScore; plain functions are accepted if they never decrease as
+    sections are added. Only one section per score equivalence class is
+    tried for each course, so the k results are k different timetables.
+    Ties keep the schedule found first. A search that scores more than
+    ``budget`` partial schedules returns the best it found (see rank_plan);
+    None searches to the end.
+    """
+    if k <= 0:
+        return []
+    score = as_schedule_score(score)
+    # Trying each course's best sections first tightens the bound early
+    plan = SearchPlan(score_representatives(course_groups, score), matrix,
+                      section_key=lambda unit: score(list(unit.sections)), requirements=requirements)
+    return [plan.expand(positions) for _, _, positions
+            in rank_plan(plan, min_credits, max_credits, k, score, budget=budget)]
+
+
+def credit_bands(desired_credits: float, tolerance: float) -> Iterator[float]:
+    yield desired_credits
+    for step in range(1, int(tolerance) + 1):
+        yield desired_credits - step
+        yield desired_credits + step
+
+
+def rank_nearest_schedules(course_groups: Sequence[Sequence[Course]], desired_credits: float, tolerance: float,
+                           k: int, score: Optional[ScheduleScore] = None,
+                           matrix: Optional[ConflictMatrix] = None,
+                           requirements: Sequence[Requirement] = (),
+                           budget: Optional[int] = RANK_NODE_BUDGET) -> List[List[Course]]:
+    """The k best schedules, taking exact-credit matches first, then ±1, ±2, ...
+
+    Within a band the total credits are fixed, so the ranking is decided by
+    how the load is spread over days and time blocks. Each band is ranked
+    within ``budget`` (see rank_schedules).
+    """
+    if matrix is None:
+        matrix = ConflictMatrix([section for sections in course_groups for section in sections])
+    # One score object across bands so its per-section caches are shared
+    score = as_schedule_score(score)
+    ranked: List[List[Course]] = []
+    for credits in credit_bands(desired_credits, tolerance):
+        if len(ranked) >= k:
+            break
+        if credits > 0:
+            ranked.extend(rank_schedules(course_groups, credits, credits, k - len(ranked), score, matrix,
+                                         requirements, budget))
+    return ranked
+
+
+def search_nearest_schedules(course_groups: Sequence[Sequence[Course]], desired_credits: float,
+                             tolerance: float, matrix: Optional[ConflictMatrix] = None,
+                             requirements: Sequence[Requirement] = ()) -> Iterator[List[Course]]:
+    """Like search_schedules, but yield exact-credit matches first, then ±1, ±2, ...
+
+    Each pass is an exact-credit search, which the bounds prune much harder
+    than one wide window.
+    """
+    if matrix is None:
+        matrix = ConflictMatrix([section for sections in course_groups for section in sections])
+    for credits in credit_bands(desired_credits, tolerance):
+        if credits > 0:
+            yield from search_schedules(course_groups, credits, credits, matrix, requirements=requirements)
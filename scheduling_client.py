@@ -0,0 +1,148 @@
+import base64
+import json
+import os
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Union
+
+from data_preprocessing import Course
+from tracing import add_records, is_tracing, span
+
+# Where scheduling_service.py listens; start it with `python scheduling_service.py` before the app
+SERVICE_URL = os.environ.get('SCHEDULER_SERVICE_URL', 'http://127.0.0.1:8765')
+REQUEST_TIMEOUT = 120
+
+
+class ServiceError(Exception):
+    """The scheduling service could not be reached or rejected the request.
+
+    ``reason`` is the service's code for a rejection the caller can act on,
+    such as 'unknown_crn' for a locked section no longer in the catalog.
+    """
+
+    def __init__(self, message: str, reason: Optional[str] = None):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _call(path: str, payload: Optional[Dict] = None, timeout: float = REQUEST_TIMEOUT) -> Dict:
+    """POST payload to path (GET without one); a traced caller also gets the service's spans of the request"""
+    with span('service_call', path=path):
+        if payload is not None and is_tracing():
+            payload = dict(payload, trace=True)
+        result = _request(path, payload, timeout)
+        add_records(result.pop('spans', []))
+    return result
+
+
+def _request(path: str, payload: Optional[Dict], timeout: float) -> Dict:
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(SERVICE_URL + path, data=data, method='POST' if data is not None else 'GET',
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        try:
+            body = json.load(e)
+        except ValueError:
+            body = {}
+        raise ServiceError(f"{path} failed: {body.get('error', e.reason)}", body.get('reason')) from e
+    except (urllib.error.URLError, OSError) as e:
+        raise ServiceError(f"Scheduling service at {SERVICE_URL} is not reachable ({e}); "
+                           f"start it with `python scheduling_service.py`") from e
+
+
+def health() -> Dict:
+    return _call('/health')
+
+
+def terms() -> Dict[str, str]:
+    """The terms the service schedules for, as term code -> description, oldest first"""
+    return health()['terms']
+
+
+def parse_still_needed(pdf_bytes: bytes) -> List[Union[str, Dict]]:
+    """The still-needed list of a DegreeWorks PDF, parsed by the service"""
+    return _call('/still-needed', {'pdf_base64': base64.b64encode(pdf_bytes).decode('ascii')})['still_needed']
+
+
+def fetch_schedules(still_needed: List[Union[str, Dict]], desired_credits: int, offset: int = 0,
+                    limit: int = 4, request_id: Optional[str] = None, locked: Sequence[str] = (),
+                    excluded: Sequence[str] = (), exclude_full: bool = False, term: Optional[str] = None) -> Dict:
+    """One page of schedules of term (the service's latest if None), as the /schedules response with
+    sections rebuilt as Courses.
+
+    Every schedule includes the sections whose CRNs are in locked and none of the course codes in excluded,
+    and with exclude_full no section without open seats.
+    """
+    result = _call('/schedules', {'still_needed': still_needed, 'desired_credits': desired_credits,
+                                  'offset': offset, 'limit': limit, 'request_id': request_id,
+                                  'locked': list(locked), 'excluded': list(excluded),
+                                  'exclude_full': exclude_full, 'term': term})
+    result['schedules'] = [[Course.from_json(section) for section in schedule] for schedule in result['schedules']]
+    return result
+
+
+def find_sections(term: Optional[str] = None, **criteria) -> List[Course]:
+    """Sections of term (the service's latest if None) matching every criterion, as for Catalog.query"""
+    result = _call('/sections', dict(criteria, term=term))
+    return [Course.from_json(section) for section in result['sections']]
+
+
+def cancel(request_id: str) -> bool:
+    return _call('/cancel', {'request_id': request_id})['cancelled']
+
+
+class ScheduleStream:
+    """Schedules in the service's order, fetching a page whenever the previous one runs out.
+
+    Works as the lazy source of a SchedulePager, just like CourseScheduler.iter_schedules.
+    A failed fetch raises ServiceError and leaves the stream where it was, so the next
+    call retries that page instead of ending the stream.
+    """
+
+    def __init__(self, still_needed: List[Union[str, Dict]], desired_credits: int, page_size: int = 4,
+                 locked: Sequence[str] = (), excluded: Sequence[str] = (), exclude_full: bool = False,
+                 term: Optional[str] = None):
+        self._request = (still_needed, desired_credits)
+        self._options = {'locked': locked, 'excluded': excluded, 'exclude_full': exclude_full, 'term': term}
+        self._page_size = page_size
+        self._offset = 0
+        self._schedules = deque()
+        self._exhausted = False
+
+    def __iter__(self) -> 'ScheduleStream':
+        return self
+
+    def __next__(self) -> List[Course]:
+        if not self._schedules and not self._exhausted:
+            self._fetch()
+        if not self._schedules:
+            raise StopIteration
+        return self._schedules.popleft()
+
+    def _fetch(self) -> None:
+        request_id = uuid.uuid4().hex
+        try:
+            page = fetch_schedules(*self._request, offset=self._offset, limit=self._page_size,
+                                   request_id=request_id, **self._options)
+        except BaseException:
+            # An interrupted caller (a Streamlit rerun, say) should not leave the solve running
+            try:
+                cancel(request_id)
+            except ServiceError:
+                pass
+            raise
+        self._schedules.extend(page['schedules'])
+        self._offset += len(page['schedules'])
+        self._exhausted = page['exhausted'] or not page['schedules']
+
+
+def iter_schedules(still_needed: List[Union[str, Dict]], desired_credits: int, page_size: int = 4,
+                   locked: Sequence[str] = (), excluded: Sequence[str] = (),
+                   exclude_full: bool = False, term: Optional[str] = None) -> ScheduleStream:
+    """A ScheduleStream over the service's schedules for these arguments"""
+    return ScheduleStream(still_needed, desired_credits, page_size, locked, excluded, exclude_full, term)
@@ -0,0 +1,425 @@
+"""Headless JSON-over-HTTP scheduling service around CourseScheduler.
+
+    python scheduling_service.py [--host 127.0.0.1] [--port 8765] [--concurrency 4] [--refresh-interval 60]
+
+Endpoints (JSON in, JSON out):
+
+    GET  /health        catalog version and size, the terms offered and those loaded
+    POST /still-needed  {"pdf_base64"} -> {"still_needed"}
+    POST /schedules     {"still_needed" | "pdf_base64", "desired_credits", "offset", "limit", "term",
+                         "locked", "excluded", "exclude_full", "request_id", "timeout"}
+                        -> {"still_needed", "term", "schedules", "exhausted", ...}
+    POST /sections      {"term", "crn", "subject", "course_number", "instructor", "building", "room",
+                         "method", "campus", "during": [days, begin_minutes, end_minutes], "limit"}
+                        -> {"term", "sections", "truncated"}  (see Catalog.query)
+    POST /cancel        {"request_id"} -> {"cancelled"}
+
+With "trace": true, a /still-needed or /schedules response also holds the
+request's spans (see tracing) as "spans", for the client's debug panel.
+
+The latest term's catalog is loaded up front and shared by every request;
+other terms are loaded when first asked for (see catalog.get_catalog). With
+a refresh interval, each loaded term is kept in step with the catalog pages
+by a CatalogRefresher. Solves run on a bounded
+thread pool, at most ``concurrency`` at a time, and stop early when the
+client disconnects, the timeout passes or /cancel names their request_id.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import contextvars
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from catalog import Catalog, default_term, get_catalog, loaded_terms
+from catalog_refresh import CatalogRefresher
+from course_scheduler import CourseScheduler, SolveSession, UnknownSection
+from data_preprocessing import load_terms
+from degreeworks_pdf_parser import parse_degreeworks_pdf
+from schedule_solver import SearchCancelled, set_cancel_event
+from tracing import logger, span, start_trace
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 32 << 20
+MAX_LIMIT = 50
+MAX_SECTIONS = 500
+# Catalog.query criteria that are plain strings
+_QUERY_FIELDS = ('crn', 'subject', 'course_number', 'instructor', 'building', 'room', 'method', 'campus')
+
+
+class RequestError(Exception):
+    """A request the client got wrong; answered with 400 and the message"""
+
+
+def _pdf_bytes(payload: Dict) -> bytes:
+    try:
+        return base64.b64decode(payload['pdf_base64'], validate=True)
+    except (KeyError, TypeError, binascii.Error) as e:
+        raise RequestError(f"pdf_base64 must be the base64 encoded PDF: {e}")
+
+
+def _string_list(payload: Dict, name: str) -> List[str]:
+    value = payload.get(name) or []
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise RequestError(f"{name} must be a list of strings")
+    return value
+
+
+def _still_needed_entries(value) -> List[Union[str, Dict]]:
+    """Check still_needed has the shape parse_degreeworks_pdf gives: strings and "options" groups"""
+    if not isinstance(value, list):
+        raise RequestError("still_needed must be a list")
+    for entry in value:
+        if isinstance(entry, str):
+            continue
+        if not isinstance(entry, dict) or entry.get('type') != 'options':
+            raise RequestError('still_needed entries must be strings or {"type": "options", ...} objects')
+        courses, num_to_pick = entry.get('courses'), entry.get('num_to_pick')
+        if not isinstance(courses, list) or not all(isinstance(code, str) for code in courses):
+            raise RequestError("courses of a still_needed option must be a list of strings")
+        if isinstance(num_to_pick, bool) or not isinstance(num_to_pick, int) or num_to_pick < 1:
+            raise RequestError("num_to_pick of a still_needed option must be a positive integer")
+    return value
+
+
+def _int_field(payload: Dict, name: str, default: Optional[int], low: int, high: int) -> int:
+    value = payload.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise RequestError(f"{name} must be an integer from {low} to {high}")
+    return value
+
+
+class SchedulingService:
+    """Request handling and the state shared between requests: the catalogs and recent solve sessions"""
+
+    def __init__(self, catalog: Optional[Catalog] = None, concurrency: int = 4, max_sessions: int = 64,
+                 directory: str = 'all_courses'):
+        self.directory = directory
+        # The catalog of requests that name no term; other terms come from get_catalog
+        self.catalog = catalog if catalog is not None else get_catalog(directory)
+        self.terms = load_terms(directory) if catalog is None else {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='solve')
+        # Solve sessions by term and still-needed list, so paging through one audit and editing its
+        # locked sections or left out courses reuses the work of earlier requests
+        self._sessions: 'OrderedDict[str, SolveSession]' = OrderedDict()
+        self._max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._cancel_events: Dict[str, threading.Event] = {}
+
+    def close(self) -> None:
+        for event in list(self._cancel_events.values()):
+            event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def served_terms(self) -> List[Optional[str]]:
+        """Terms with a catalog in use: the default one and every other term loaded since"""
+        terms = [self.catalog.term]
+        if self.terms:
+            terms += [term for term in loaded_terms(self.directory) if term not in terms]
+        return terms
+
+    def refreshed(self, result: Dict, catalog: Catalog) -> None:
+        """Take up a catalog refresh; the term's sessions are rebuilt so new sections and filled seats are seen"""
+        if catalog.term == self.catalog.term:
+            self.catalog = catalog
+        if result['pages']:
+            with self._lock:
+                for key in [key for key, session in self._sessions.items()
+                            if session.scheduler.catalog.term == catalog.term]:
+                    del self._sessions[key]
+
+    def offer(self, terms: Dict[str, str], catalog: Catalog) -> None:
+        """Take up the terms now in the directory and the latest one's catalog, which requests without a term get.
+
+        Runs on the event loop, so both are read off it by the caller (see _latest_terms).
+        """
+        self.terms = terms
+        if catalog.term != self.catalog.term:
+            logger.info("Requests without a term now get term %s instead of %s", catalog.term, self.catalog.term)
+            self.catalog = catalog
+
+    def _catalog(self, term: Optional[str]) -> Catalog:
+        if term is None or term == self.catalog.term:
+            return self.catalog
+        if term not in self.terms:
+            raise RequestError(f"term must be one of {sorted(self.terms) or [self.catalog.term]}")
+        return get_catalog(self.directory, term)
+
+    def _session(self, still_needed: List[Union[str, Dict]], desired_credits: int, exclude_full: bool,
+                 term: Optional[str]) -> SolveSession:
+        catalog = self._catalog(term)
+        key = json.dumps([catalog.term, still_needed, exclude_full], sort_keys=True)
+        with self._lock:
+            session = self._sessions.get(key)
+            # A term evicted and loaded again has a new catalog, which the session must use
+            if session is not None and session.scheduler.catalog is catalog:
+                self._sessions.move_to_end(key)
+                return session
+        session = CourseScheduler(None, catalog, still_needed_courses=still_needed,
+                                  exclude_full=exclude_full).session(desired_credits)
+        with self._lock:
+            self._sessions[key] = session
+            while len(self._sessions) > self._max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def _still_needed(self, payload: Dict) -> List[Union[str, Dict]]:
+        if 'still_needed' in payload:
+            return _still_needed_entries(payload['still_needed'])
+        # An unreadable upload raises UnreadablePdf, a ValueError, so it is answered with 400
+        return parse_degreeworks_pdf(_pdf_bytes(payload))["still_needed_courses"]
+
+    def _schedules(self, payload: Dict) -> Dict:
+        desired_credits = _int_field(payload, 'desired_credits', None, 1, 30)
+        offset = _int_field(payload, 'offset', 0, 0, 10 ** 6)
+        limit = _int_field(payload, 'limit', 4, 1, MAX_LIMIT)
+        locked = _string_list(payload, 'locked')
+        excluded = _string_list(payload, 'excluded')
+        exclude_full = payload.get('exclude_full', False)
+        if not isinstance(exclude_full, bool):
+            raise RequestError("exclude_full must be true or false")
+        term = payload.get('term')
+        if term is not None and not isinstance(term, str):
+            raise RequestError("term must be a term code string")
+        still_needed = self._still_needed(payload)
+        session = self._session(still_needed, desired_credits, exclude_full, term)
+        # Constraints come with every request, as one session serves concurrent ones
+        schedules = session.iter_schedules(desired_credits, locked=locked, excluded=excluded)
+        # One extra schedule tells whether another page exists
+        schedules = list(itertools.islice(schedules, offset, offset + limit + 1))
+        return {
+            'still_needed': still_needed,
+            'term': session.scheduler.catalog.term,
+            'available_sections': sum(map(len, session.scheduler.available_courses.values())),
+            'offset': offset,
+            'schedules': [[section.to_json() for section in schedule] for schedule in schedules[:limit]],
+            'exhausted': len(schedules) <= limit,
+        }
+
+    def _sections(self, payload: Dict) -> Dict:
+        term = payload.get('term')
+        if term is not None and not isinstance(term, str):
+            raise RequestError("term must be a term code string")
+        limit = _int_field(payload, 'limit', MAX_LIMIT, 1, MAX_SECTIONS)
+        criteria = {}
+        for name in _QUERY_FIELDS:
+            value = payload.get(name)
+            if value is not None and not isinstance(value, str):
+                raise RequestError(f"{name} must be a string")
+            criteria[name] = value
+        during = payload.get('during')
+        if during is not None:
+            if (not isinstance(during, list) or len(during) != 3 or not isinstance(during[0], str)
+                    or not all(isinstance(minutes, int) and not isinstance(minutes, bool) for minutes in during[1:])):
+                raise RequestError("during must be [days, begin_minutes, end_minutes]")
+            criteria['during'] = tuple(during)
+        catalog = self._catalog(term)
+        # ValueError (room without building, say) is answered with 400
+        found = catalog.query(**criteria)
+        return {'term': catalog.term, 'sections': [section.to_json() for section in found[:limit]],
+                'truncated': len(found) > limit}
+
+    async def _offload(self, function: Callable, payload: Dict) -> Dict:
+        """Run function(payload) on the solve pool, cancelling the search with the request"""
+        timeout = payload.get('timeout')
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))
+                                    or timeout <= 0):
+            raise RequestError("timeout must be a positive number of seconds")
+        request_id = payload.get('request_id')
+        trace = [] if payload.get('trace') else None
+        cancel = threading.Event()
+        if request_id is not None:
+            self._cancel_events[str(request_id)] = cancel
+        try:
+            async with self._slots:
+                context = contextvars.copy_context()
+                context.run(set_cancel_event, cancel)
+                if trace is not None:
+                    context.run(start_trace, trace)
+                work = asyncio.get_running_loop().run_in_executor(self._executor, context.run, function, payload)
+                result = await asyncio.wait_for(work, timeout)
+                if trace is not None:
+                    result['spans'] = trace
+                return result
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # The worker thread only stops once its search sees the event
+            cancel.set()
+            raise
+        finally:
+            if request_id is not None:
+                self._cancel_events.pop(str(request_id), None)
+
+    async def route(self, method: str, path: str, payload: Dict) -> Tuple[int, Dict]:
+        if method == 'GET' and path == '/health':
+            return HTTPStatus.OK, {'status': 'ok', 'catalog_version': self.catalog.version,
+                                   'sections': len(self.catalog), 'term': self.catalog.term,
+                                   'terms': self.terms or {self.catalog.term: None},
+                                   'loaded_terms': self.served_terms()}
+        if method != 'POST':
+            return HTTPStatus.NOT_FOUND, {'error': f"no route for {method} {path}"}
+        if path == '/still-needed':
+            return HTTPStatus.OK, await self._offload(lambda body: {'still_needed': self._still_needed(body)},
+                                                      payload)
+        if path == '/schedules':
+            return HTTPStatus.OK, await self._offload(self._schedules, payload)
+        if path == '/sections':
+            # Off the event loop, as a term asked for the first time is loaded first
+            return HTTPStatus.OK, await self._offload(self._sections, payload)
+        if path == '/cancel':
+            event = self._cancel_events.get(str(payload.get('request_id')))
+            if event is not None:
+                event.set()
+            return HTTPStatus.OK, {'cancelled': event is not None}
+        return HTTPStatus.NOT_FOUND, {'error': f"no route for {method} {path}"}
+
+    async def _respond(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        try:
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise RequestError("the body must be a JSON object")
+            with span('service_request', path=path):
+                return await self.route(method, path, payload)
+        except UnknownSection as e:
+            # A locked CRN gone from the catalog; the client can retry without its edits
+            return HTTPStatus.BAD_REQUEST, {'error': str(e), 'reason': 'unknown_crn'}
+        except (RequestError, ValueError) as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, {'error': "the request timed out"}
+        except SearchCancelled:
+            return HTTPStatus.CONFLICT, {'error': "the request was cancelled"}
+        except Exception as e:
+            # Answered, so the client reports the failure instead of an unreachable service
+            logger.exception("%s %s failed", method, path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"the service failed: {type(e).__name__}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one HTTP/1.1 request per connection"""
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return
+            method, path = request_line[0], request_line[1].split('?', 1)[0]
+            length = int(headers.get('content-length') or 0)
+            if length > MAX_BODY_BYTES:
+                status, result = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': "the body is too large"}
+            else:
+                body = await reader.readexactly(length)
+                work = asyncio.ensure_future(self._respond(method, path, body))
+                # The client sends nothing more, so a read that finishes means it hung up
+                hangup = asyncio.ensure_future(reader.read(1))
+                await asyncio.wait({work, hangup}, return_when=asyncio.FIRST_COMPLETED)
+                if not work.done():
+                    logger.debug("Client hung up during %s %s; cancelling", method, path)
+                    work.cancel()
+                    return
+                hangup.cancel()
+                status, result = work.result()
+            data = json.dumps(result).encode('utf-8')
+            writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                         f"Connection: close\r\n\r\n".encode('latin-1') + data)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except Exception:
+            logger.exception("Request failed")
+        finally:
+            writer.close()
+
+
+def _latest_terms(directory: str) -> Tuple[Dict[str, str], Catalog]:
+    """Every term in directory and the catalog of the latest, loading it if it is new"""
+    return load_terms(directory), get_catalog(directory, default_term(directory))
+
+
+def _refresher(service: SchedulingService, term: Optional[str]) -> CatalogRefresher:
+    catalog = service.catalog if term == service.catalog.term else get_catalog(service.directory, term)
+    return CatalogRefresher(service.directory, catalog)
+
+
+async def _refresh_periodically(service: SchedulingService, interval: float) -> None:
+    """Refresh every served term each interval, starting a refresher for terms loaded since the last one"""
+    loop = asyncio.get_running_loop()
+    refreshers: Dict[Optional[str], CatalogRefresher] = {}
+    while True:
+        # Refreshers start before the wait, so they see every page change made during it
+        terms = service.served_terms()
+        for term in [term for term in refreshers if term not in terms]:
+            # Evicted terms are reloaded from the pages if asked for again
+            del refreshers[term]
+        for term in terms:
+            if term not in refreshers:
+                try:
+                    refreshers[term] = await loop.run_in_executor(None, _refresher, service, term)
+                except (OSError, ValueError) as e:
+                    logger.warning("Catalog refresh of term %s failed: %s", term, e)
+        await asyncio.sleep(interval)
+        changed = False
+        for term, refresher in list(refreshers.items()):
+            try:
+                result = await loop.run_in_executor(None, refresher.refresh)
+            except (OSError, ValueError) as e:
+                # A page caught mid-download is picked up by a later refresh
+                logger.warning("Catalog refresh of term %s failed: %s", term, e)
+                continue
+            service.refreshed(result, refresher.catalog)
+            changed = changed or bool(result['pages'])
+        if changed and service.terms:
+            # Changed pages may hold a new term; they are scanned, and its catalog loaded, off the event loop
+            try:
+                service.offer(*await loop.run_in_executor(None, _latest_terms, service.directory))
+            except (OSError, ValueError) as e:
+                logger.warning("Reading the terms in %s failed: %s", service.directory, e)
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, concurrency: int = 4,
+                catalog: Optional[Catalog] = None, refresh_interval: float = 0,
+                directory: str = 'all_courses') -> None:
+    """Serve until cancelled; refresh_interval > 0 re-checks the pages in directory that often"""
+    # Loading the default term's catalog before listening keeps the first request from paying for it
+    service = SchedulingService(catalog, concurrency, directory=directory)
+    refreshing = None
+    if refresh_interval > 0:
+        refreshing = asyncio.ensure_future(_refresh_periodically(service, refresh_interval))
+    server = await asyncio.start_server(service.handle, host, port)
+    logger.info("Scheduling service on http://%s:%d with %d sections of term %s", host, port,
+                len(service.catalog), service.catalog.term)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if refreshing is not None:
+            refreshing.cancel()
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--concurrency', type=int, default=4, help="solves running at once")
+    parser.add_argument('--refresh-interval', type=float, default=60,
+                        help="seconds between checks for changed catalog pages; 0 to never check")
+    args = parser.parse_args()
+    print(f"Serving on http://{args.host}:{args.port}")
+    asyncio.run(serve(args.host, args.port, args.concurrency, refresh_interval=args.refresh_interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import re
+from tracing import logger, span
 
 class DegreeWorksPDFParser:
     def __init__(self, text):
@@ -39,18 +40,23 @@ class DegreeWorksPDFParser:
         return list(dict.fromkeys(still_needed_courses))
 
 def parse_still_needed_courses(still_needed_text):
+    with span('requirement_parse') as parse_span:
+        courses = _parse_still_needed_lines(still_needed_text.split('\n'))
+        parse_span.count('requirements', len(courses))
+    return courses
+
+def _parse_still_needed_lines(lines):
     courses = []
-    lines = still_needed_text.split('\n')
 
-    print("Debug: Parsing still needed courses")
-    print(f"Debug: Input text:\n{still_needed_text}")
+    logger.debug("Parsing still needed courses")
+    logger.debug("Input text:\n%s", '\n'.join(lines))
 
     for line in lines:
         line = line.strip()
         if not line:
             continue
 
-        print(f"Debug: Processing line: {line}")
+        logger.debug("Processing line: %s", line)
 
         # Extract course codes (assuming they are in the format of 4 letters followed by 4 numbers)
         course_matches = re.findall(r'\b([A-Z]{4}\s*\d{4})\b', line)
@@ -70,17 +76,17 @@ def parse_still_needed_courses(still_needed_text):
                 "courses": options
             }
             courses.append(course_entry)
-            print(f"Debug: Added course options: {course_entry}")
+            logger.debug("Added course options: %s", course_entry)
         elif len(course_matches) == 1:
             course = course_matches[0].replace(" ", "")
             courses.append(course)
-            print(f"Debug: Added single course: {course}")
+            logger.debug("Added single course: %s", course)
         else:
             # If no course codes found, add the entire line as a requirement
             courses.append(line)
-            print(f"Debug: Added requirement: {line}")
+            logger.debug("Added requirement: %s", line)
 
-    print(f"Debug: Final courses list: {courses}")
+    logger.debug("Final courses list: %s", courses)
     return courses
 
 # Example usage
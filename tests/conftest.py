@@ -0,0 +1,93 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import Catalog  # noqa: E402
+from data_preprocessing import Course  # noqa: E402
+
+DAY_FIELDS = (('M', 'monday'), ('T', 'tuesday'), ('W', 'wednesday'), ('R', 'thursday'), ('F', 'friday'),
+              ('S', 'saturday'), ('U', 'sunday'))
+
+
+def banner_record(crn, subject='ITSC', number='1212', meetings=(('MWF', '0900', '0950'),), credits=3,
+                  term='202510', link_identifier=None, seats_available=None,
+                  dates=('01/13/2025', '05/08/2025')):
+    """A Banner searchResults record with the fields the ingest reads; meetings are (days, begin, end)"""
+    meetings_faculty = []
+    for days, begin_time, end_time in meetings:
+        meeting_time = {name: day in days for day, name in DAY_FIELDS}
+        meeting_time.update({'beginTime': begin_time, 'endTime': end_time, 'startDate': dates[0],
+                             'endDate': dates[1], 'building': 'WOODW' if begin_time else 'ONLINE', 'room': '101'})
+        meetings_faculty.append({'courseReferenceNumber': str(crn), 'meetingTime': meeting_time})
+    return {'term': term, 'termDesc': 'Spring 2025', 'courseReferenceNumber': str(crn), 'subject': subject,
+            'courseNumber': number, 'courseTitle': f"{subject} {number}", 'creditHours': credits,
+            'isSectionLinked': link_identifier is not None, 'linkIdentifier': link_identifier,
+            'seatsAvailable': seats_available, 'enrollment': 0, 'waitAvailable': 0,
+            'meetingsFaculty': meetings_faculty, 'faculty': []}
+
+
+@pytest.fixture
+def make_section():
+    def make(crn, **fields):
+        return Course(banner_record(crn, **fields))
+    return make
+
+
+def write_page(directory, filename, records):
+    """Write records as a Banner searchResults page"""
+    with open(os.path.join(directory, filename), 'w') as file:
+        json.dump({'success': True, 'totalCount': len(records), 'data': records}, file)
+
+
+MEETING_PATTERNS = (('MWF', '0900', '0950'), ('MWF', '1000', '1050'), ('MWF', '1100', '1150'),
+                    ('TR', '0930', '1045'), ('TR', '1100', '1215'), ('TR', '1400', '1515'),
+                    ('MW', '1600', '1715'), ('T', '1800', '2045'))
+
+
+def random_catalog(seed, courses=6, max_sections=3):
+    """A small catalog of ITSC courses whose sections draw from MEETING_PATTERNS, some with a second meeting"""
+    rng = random.Random(seed)
+    course_data = {'ITSC': {}}
+    crn = 100
+    for number in range(1000, 1000 + courses):
+        credits = rng.choice((3, 3, 4, 1))
+        sections = []
+        for _ in range(rng.randint(1, max_sections)):
+            meetings = [rng.choice(MEETING_PATTERNS)]
+            if rng.random() < 0.2:
+                meetings.append(rng.choice(MEETING_PATTERNS))
+            sections.append(Course(banner_record(crn, number=str(number), meetings=meetings, credits=credits)))
+            crn += 1
+        course_data['ITSC'][str(number)] = sections
+    return Catalog(course_data)
+
+
+def make_pdf(pages):
+    """A PDF with one page per list of text lines, set in Helvetica from the top of the page"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    page_ids = []
+    for lines in pages:
+        text = ''.join(f"BT /F1 10 Tf 40 {750 - 14 * number} Td ({line}) Tj ET\n"
+                       for number, line in enumerate(lines)).encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(text), text))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+                       b'/Resources << /Font << /F1 3 0 R >> >> >>' % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % page_id for page_id in page_ids), len(page_ids))
+    pdf = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return pdf
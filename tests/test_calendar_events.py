@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from calendar_events import initial_date, meeting_event
+
+
+@pytest.mark.parametrize('days, expected', [('MWF', [1, 3, 5]), ('TR', [2, 4]), ('S', [6]), ('U', [0]),
+                                            ('MTWRFSU', [1, 2, 3, 4, 5, 6, 0])])
+def test_days_of_week_count_from_sunday(make_section, days, expected):
+    course = make_section(1, meetings=((days, '0900', '0950'),))
+    event = meeting_event(course, course.meetings[0], 'red')
+    assert event['daysOfWeek'] == expected
+    assert (event['startTime'], event['endTime']) == ('09:00:00', '09:50:00')
+    assert event['title'] == 'ITSC 1212'
+
+
+def test_recurrence_end_is_exclusive(make_section):
+    course = make_section(1, dates=('01/13/2025', '05/08/2025'))
+    event = meeting_event(course, course.meetings[0], 'red')
+    assert (event['startRecur'], event['endRecur']) == ('2025-01-13', '2025-05-09')
+    # The day after the last day of a month or year rolls over
+    course = make_section(2, dates=('08/19/2024', '12/31/2024'))
+    assert meeting_event(course, course.meetings[0], 'red')['endRecur'] == '2025-01-01'
+
+
+def test_meeting_without_dates_recurs_every_week(make_section):
+    course = make_section(1, dates=(None, None))
+    event = meeting_event(course, course.meetings[0], 'red')
+    assert 'startRecur' not in event and 'endRecur' not in event
+    assert initial_date([event]) == datetime.now().strftime('%Y-%m-%d')
+
+
+def test_meeting_without_a_time_or_days_has_no_event(make_section):
+    online = make_section(1, meetings=(('', '', ''),))
+    assert meeting_event(online, online.meetings[0], 'red') is None
+    assert meeting_event(online, ('MWF', '0900', None, '01/13/2025', '05/08/2025'), 'red') is None
+
+
+def test_initial_date_is_the_earliest_start(make_section):
+    courses = [make_section(1, dates=('01/21/2025', '05/08/2025')), make_section(2, dates=('01/13/2025', '03/01/2025')),
+               make_section(3, dates=(None, None))]
+    events = [meeting_event(course, course.meetings[0], 'red') for course in courses]
+    assert initial_date(events) == '2025-01-13'
+    assert initial_date() == datetime.now().strftime('%Y-%m-%d')
@@ -0,0 +1,89 @@
+import pytest
+
+from catalog import Catalog
+from conftest import banner_record
+from data_preprocessing import Course
+
+
+def section(crn, subject='ITSC', number='1212', instructor='900001', building='WOODW', room='101',
+            method='LEC', campus='Main Campus', meetings=(('MWF', '0900', '0950'),)):
+    record = banner_record(crn, subject=subject, number=number, meetings=meetings)
+    record.update({'faculty': [{'bannerId': instructor}], 'instructionalMethod': method, 'campusDescription': campus})
+    for meeting in record['meetingsFaculty']:
+        meeting['meetingTime'].update({'building': building, 'room': room})
+    return Course(record)
+
+
+@pytest.fixture
+def catalog():
+    sections = [
+        section(1),
+        section(2, instructor='900002', room='202', meetings=(('TR', '1100', '1215'),)),
+        section(3, number='2214', building='EPIC', room='101', method='HYB', meetings=(('MW', '1300', '1415'),)),
+        section(4, number='2214', instructor='900002', campus='Center City', meetings=(('F', '1000', '1250'),)),
+        section(5, subject='MATH', number='1241', building='FRET', room='101', meetings=(('TR', '0800', '0915'),)),
+        section(6, subject='MATH', number='1241', instructor='900002', method='OL', campus='Online',
+                building='ONLINE', room='', meetings=(('', '', ''),)),
+    ]
+    course_data = {}
+    for course in sections:
+        course_data.setdefault(course.subject, {}).setdefault(course.course_number, []).append(course)
+    return Catalog(course_data)
+
+
+def crns(sections):
+    return [section.crn for section in sections]
+
+
+@pytest.mark.parametrize('criteria, expected', [
+    ({}, ['1', '2', '3', '4', '5', '6']),
+    ({'crn': '3'}, ['3']),
+    ({'crn': '99'}, []),
+    ({'subject': 'ITSC'}, ['1', '2', '3', '4']),
+    ({'subject': 'ITSC', 'course_number': '2214'}, ['3', '4']),
+    ({'instructor': '900002'}, ['2', '4', '6']),
+    ({'building': 'WOODW'}, ['1', '2', '4']),
+    ({'building': 'WOODW', 'room': '101'}, ['1', '4']),
+    ({'building': 'EPIC', 'room': '202'}, []),
+    ({'method': 'HYB'}, ['3']),
+    ({'campus': 'Center City'}, ['4']),
+    ({'during': ('MF', 570, 620)}, ['1', '4']),
+    ({'during': ('TR', 540, 660)}, ['5']),
+])
+def test_each_index(catalog, criteria, expected):
+    assert crns(catalog.query(**criteria)) == expected
+
+
+def test_meeting_during_matches_overlapping_meetings_only(catalog):
+    assert crns(catalog.meeting_during('T', 670, 690)) == ['2']
+    # Meetings that only touch the window (08:00-09:15 and 11:00-12:15 on R) are left out
+    assert crns(catalog.meeting_during('R', 555, 660)) == []
+    assert crns(catalog.meeting_during('MTWRF', 0, 1440)) == ['1', '2', '3', '4', '5']
+
+
+def test_intersection_keeps_catalog_order_whichever_index_is_smallest(catalog):
+    # Each intersection starts from a different smallest index; the result is in catalog order either way
+    assert crns(catalog.query(instructor='900002', building='WOODW')) == ['2', '4']
+    assert crns(catalog.query(subject='MATH', instructor='900002', campus='Online')) == ['6']
+    assert crns(catalog.query(campus='Main Campus', subject='ITSC', method='LEC')) == ['1', '2']
+    assert crns(catalog.query(instructor='900002', during=('MTWRF', 0, 1440))) == ['2', '4']
+
+
+def test_room_and_course_number_need_what_they_narrow(catalog):
+    with pytest.raises(ValueError, match='building'):
+        catalog.query(room='101')
+    with pytest.raises(ValueError, match='subject'):
+        catalog.query(course_number='1212')
+
+
+def test_still_needed_courses_are_resolved_through_query(catalog, monkeypatch):
+    asked = []
+    query = Catalog.query
+
+    def recording_query(self, **criteria):
+        asked.append(criteria)
+        return query(self, **criteria)
+    monkeypatch.setattr(Catalog, 'query', recording_query)
+    resolved = catalog.resolve_still_needed(['ITSC2214', 'MATH1241'])
+    assert asked == [{'subject': 'ITSC', 'course_number': '2214'}, {'subject': 'MATH', 'course_number': '1241'}]
+    assert crns(resolved['sections']['MATH1241']) == ['5', '6']
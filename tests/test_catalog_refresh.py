@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+import catalog
+from catalog import get_catalog
+from catalog_refresh import CatalogRefresher
+from conftest import banner_record, write_page
+from data_preprocessing import load_course_data
+
+
+@pytest.fixture
+def pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, '_loaded', catalog.OrderedDict())
+    monkeypatch.setattr(catalog, '_versions', {})
+    monkeypatch.setattr(catalog, '_default_terms', {})
+    write_page(tmp_path, 'classes_0.json', [banner_record(crn, seats_available=10) for crn in (1, 2)])
+    write_page(tmp_path, 'classes_1.json', [banner_record(crn, number='2214', seats_available=5) for crn in (3, 4)])
+    return str(tmp_path)
+
+
+def rewrite_page(directory, filename, records):
+    """Rewrite a page so the refresher sees it changed even within one mtime tick"""
+    path = os.path.join(directory, filename)
+    mtime_ns = os.stat(path).st_mtime_ns
+    write_page(directory, filename, records)
+    os.utime(path, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+
+
+def crn_layout(shared_catalog):
+    return {(subject, number): [(section.crn, section.meeting_minutes, section.seats_available)
+                                for section in sections]
+            for subject, numbers in shared_catalog.courses.items() for number, sections in numbers.items()}
+
+
+def test_unchanged_pages_are_not_reread(pages):
+    refresher = CatalogRefresher(pages)
+    assert refresher.refresh() == {'pages': 0, 'seats': 0, 'added': 0, 'removed': 0, 'changed': 0,
+                                   'version': refresher.catalog.version}
+
+
+def test_seat_only_change_updates_sections_in_place(pages):
+    refresher = CatalogRefresher(pages)
+    shared = get_catalog(pages)
+    section = shared.section('3')
+    rewrite_page(pages, 'classes_1.json', [banner_record(3, number='2214', seats_available=0),
+                                           banner_record(4, number='2214', seats_available=5)])
+    result = refresher.refresh()
+    assert (result['pages'], result['seats'], result['added'], result['removed'], result['changed']) == (1, 1, 0, 0, 0)
+    assert result['version'] == shared.version
+    assert get_catalog(pages) is shared
+    assert shared.section('3') is section and section.seats_available == 0
+
+
+def test_structural_changes_publish_a_new_version(pages):
+    refresher = CatalogRefresher(pages)
+    shared = get_catalog(pages)
+    unchanged = shared.section('1')
+    rescheduled = shared.section('3')
+    rewrite_page(pages, 'classes_1.json', [banner_record(3, number='2214', seats_available=5,
+                                                         meetings=(('TR', '1100', '1215'),)),
+                                           banner_record(5, number='2214', seats_available=5)])
+    result = refresher.refresh()
+    assert (result['pages'], result['seats'], result['added'], result['removed'], result['changed']) == (1, 0, 1, 1, 1)
+    assert result['version'] == shared.version + 1
+
+    published = get_catalog(pages)
+    assert published is refresher.catalog and published.version == result['version']
+    # The old version is left as it was for schedulers still using it
+    assert shared.section('3') is rescheduled and rescheduled.days == 'MWF'
+    assert published.section('4') is None and published.section('3').days == 'TR'
+    assert published.section('1') is unchanged
+    assert crn_layout(published) == crn_layout(catalog.Catalog(load_course_data(pages)))
+
+
+def test_removed_page_drops_its_sections(pages):
+    refresher = CatalogRefresher(pages)
+    os.remove(os.path.join(pages, 'classes_0.json'))
+    result = refresher.refresh()
+    assert (result['pages'], result['removed']) == (1, 2)
+    assert refresher.catalog.section('1') is None and refresher.catalog.section('3') is not None
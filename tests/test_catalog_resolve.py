@@ -0,0 +1,54 @@
+from catalog import Catalog
+from conftest import random_catalog
+
+
+def test_code_shared_by_several_groups_is_resolved_once(monkeypatch):
+    catalog = random_catalog(0)
+    asked = []
+    query = Catalog.query
+
+    def recording_query(self, **criteria):
+        asked.append(criteria['course_number'])
+        return query(self, **criteria)
+    monkeypatch.setattr(Catalog, 'query', recording_query)
+    resolved = catalog.resolve_still_needed([
+        'ITSC1000',
+        {'type': 'options', 'num_to_pick': 1, 'courses': ['ITSC1000', 'ITSC1001']},
+        {'type': 'options', 'num_to_pick': 2, 'courses': ['ITSC1001', 'ITSC1002', 'ITSC1000']},
+    ])
+    assert asked == ['1000', '1001', '1002']
+    assert list(resolved['sections']) == ['ITSC1000', 'ITSC1001', 'ITSC1002']
+    assert resolved['sections']['ITSC1001'] == catalog.sections('ITSC', '1001')
+    assert resolved['requirements'] == [
+        {'courses': ('ITSC1000',), 'num_to_pick': 1},
+        {'courses': ('ITSC1000', 'ITSC1001'), 'num_to_pick': 1},
+        {'courses': ('ITSC1001', 'ITSC1002', 'ITSC1000'), 'num_to_pick': 2},
+    ]
+
+
+def test_codes_with_spaces_are_joined():
+    catalog = random_catalog(0)
+    resolved = catalog.resolve_still_needed(['ITSC 1000', {'type': 'options', 'num_to_pick': 1,
+                                                          'courses': ['ITSC 1001', 'ITSC1001']}])
+    assert list(resolved['sections']) == ['ITSC1000', 'ITSC1001']
+    # The same course written two ways is one option
+    assert resolved['requirements'][1] == {'courses': ('ITSC1001',), 'num_to_pick': 1}
+
+
+def test_lines_that_are_not_course_codes_are_skipped():
+    catalog = random_catalog(0)
+    resolved = catalog.resolve_still_needed([
+        '120 credit hours are required. You currently have 90',
+        {'type': 'options', 'num_to_pick': 1, 'courses': ['Free elective', 'ITSC1003']},
+        {'type': 'options', 'num_to_pick': 1, 'courses': ['2 Classes in any 3000 level course']},
+        {'type': 'other'},
+        'ITSC1004',
+    ])
+    assert list(resolved['sections']) == ['ITSC1003', 'ITSC1004']
+    assert resolved['requirements'] == [{'courses': ('ITSC1003',), 'num_to_pick': 1},
+                                        {'courses': ('ITSC1004',), 'num_to_pick': 1}]
+
+
+def test_course_missing_from_the_catalog_resolves_to_no_sections():
+    resolved = random_catalog(0).resolve_still_needed(['MATH1241'])
+    assert resolved == {'sections': {'MATH1241': ()}, 'requirements': [{'courses': ('MATH1241',), 'num_to_pick': 1}]}
@@ -0,0 +1,24 @@
+import os
+
+from catalog_snapshot import load_snapshot, write_snapshot
+from conftest import banner_record, write_page
+from data_preprocessing import load_course_rows
+
+
+class Planted:
+    def __reduce__(self):
+        return (os.remove, ('classes_0.json',))
+
+
+def test_rows_round_trip_and_a_planted_object_is_refused(tmp_path):
+    directory = str(tmp_path)
+    write_page(directory, 'classes_0.json', [banner_record(crn) for crn in (1, 2)])
+    rows = load_course_rows(directory)
+    assert load_snapshot(directory)[0] == rows
+    _, manifest, _ = load_snapshot(directory)
+    write_snapshot(directory, manifest, [Planted()])
+    assert load_snapshot(directory)[0] is None
+    assert os.path.exists(os.path.join(directory, 'classes_0.json'))
+    # The next load rebuilds the snapshot from the pages
+    assert load_course_rows(directory) == rows
+    assert load_snapshot(directory)[0] == rows
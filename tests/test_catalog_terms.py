@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+import catalog
+from catalog import default_term, get_catalog, loaded_terms, publish_catalog
+from conftest import banner_record, write_page
+from data_preprocessing import load_course_data, load_terms
+
+
+@pytest.fixture
+def two_terms(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, '_loaded', catalog.OrderedDict())
+    monkeypatch.setattr(catalog, '_versions', {})
+    monkeypatch.setattr(catalog, '_default_terms', {})
+    write_page(tmp_path, 'classes_0.json', [banner_record(crn, term='202510') for crn in (1, 2, 3)])
+    write_page(tmp_path, 'classes_1.json', [banner_record(crn, term='202480') for crn in (1, 4)])
+    return str(tmp_path)
+
+
+def test_each_term_loads_only_its_sections(two_terms):
+    assert list(load_terms(two_terms)) == ['202480', '202510']
+    assert default_term(two_terms) == '202510'
+    assert loaded_terms(two_terms) == []
+    latest = get_catalog(two_terms)
+    assert (latest.term, len(latest)) == ('202510', 3)
+    assert loaded_terms(two_terms) == ['202510']
+    earlier = get_catalog(two_terms, '202480')
+    assert sorted(section.crn for section in earlier.sections('ITSC', '1212')) == ['1', '4']
+    assert get_catalog(two_terms, '202480') is earlier
+    assert os.path.exists(os.path.join(two_terms, '.catalog.snapshot.202480'))
+    assert sum(map(len, load_course_data(two_terms)['ITSC'].values())) == 5
+
+
+def test_least_recently_used_term_is_evicted(two_terms, monkeypatch):
+    monkeypatch.setattr(catalog, 'MAX_LOADED_TERMS', 1)
+    latest = get_catalog(two_terms)
+    get_catalog(two_terms, '202480')
+    assert loaded_terms(two_terms) == ['202480']
+    reloaded = get_catalog(two_terms)
+    assert reloaded is not latest and len(reloaded) == len(latest)
+    assert publish_catalog({}, two_terms).version == reloaded.version + 1
+
+
+def test_default_term_follows_a_new_term(two_terms):
+    assert default_term(two_terms) == '202510'
+    write_page(two_terms, 'classes_2.json', [banner_record(9, term='202580')])
+    load_terms(two_terms)
+    assert default_term(two_terms) == '202580'
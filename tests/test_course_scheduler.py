@@ -0,0 +1,21 @@
+from catalog import Catalog
+from conftest import banner_record
+from course_scheduler import CourseScheduler
+from data_preprocessing import Course
+
+
+def test_solve_registers_both_members_of_a_bundle():
+    lecture = Course(banner_record(1, number='1241', credits=3, link_identifier='A1'))
+    labs = [Course(banner_record(2, number='1241', credits=1, link_identifier='B1',
+                                 meetings=(('M', '0900', '1050'),))),
+            Course(banner_record(3, number='1241', credits=1, link_identifier='B1',
+                                 meetings=(('T', '1400', '1550'),)))]
+    other = Course(banner_record(4, number='1212', meetings=(('TR', '1400', '1515'),)))
+    catalog = Catalog({'ITSC': {'1241': [lecture] + labs, '1212': [other]}})
+    scheduler = CourseScheduler(None, catalog, still_needed_courses=['ITSC1241', 'ITSC1212'])
+    schedules = {tuple(sorted(section.crn for section in schedule))
+                 for schedule in scheduler.iter_schedules(4, ranked_first=0)}
+    # Lab 2 meets at the lecture's time and lab 3 with ITSC1212, so the lecture only comes with lab 3
+    assert schedules == {('1', '3'), ('4',)}
+    for best in scheduler.generate_schedules(4, max_schedules=1), scheduler.session(4).generate_schedules(4, 1):
+        assert [sorted(section.crn for section in schedule) for schedule in best] == [['1', '3']]
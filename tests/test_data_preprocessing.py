@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+from conftest import banner_record, write_page
+from data_preprocessing import SectionBundle, bundle_sections, iter_page_records
+
+PAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'all_courses')
+
+
+def page_files():
+    if not os.path.isdir(PAGES):
+        return []
+    return sorted(filename for filename in os.listdir(PAGES) if filename.endswith('.json'))
+
+
+def json_records(path):
+    with open(path) as file:
+        return json.load(file)['data'] or []
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 16, 100, 4096])
+def test_records_straddling_chunks_decode_like_json_load(tmp_path, chunk_size):
+    records = [banner_record(crn, meetings=(('MWF', '0900', '0950'), ('T', '1400', '1650'))) for crn in range(5)]
+    records[2]['courseTitle'] = 'Quotes " and brackets ] and braces } inside a title'
+    write_page(tmp_path, 'classes_0.json', records)
+    path = os.path.join(tmp_path, 'classes_0.json')
+    assert list(iter_page_records(path, chunk_size)) == json_records(path) == records
+
+
+@pytest.mark.parametrize('body', ['{"success": true, "totalCount": 0, "data": null}', '{"success": false}',
+                                  '{"success": true, "data": []}', '{"data" :\n [ \n ] }'])
+def test_page_without_records(tmp_path, body):
+    path = tmp_path / 'classes_0.json'
+    path.write_text(body)
+    assert list(iter_page_records(str(path), 4)) == []
+
+
+@pytest.mark.parametrize('body', ['{"data": [{"crn": "1"}, {"crn": "2"}', '{"data": [{"crn": "1"}, {"crn": ',
+                                  '{"data": ['])
+def test_unterminated_array_raises(tmp_path, body):
+    path = tmp_path / 'classes_0.json'
+    path.write_text(body)
+    with pytest.raises(ValueError):
+        list(iter_page_records(str(path), 5))
+
+
+@pytest.mark.skipif(not page_files(), reason="no downloaded pages in all_courses")
+def test_downloaded_pages_decode_like_json_load():
+    smallest = min(page_files(), key=lambda filename: os.path.getsize(os.path.join(PAGES, filename)))
+    for filename in page_files():
+        path = os.path.join(PAGES, filename)
+        # Small chunks are slow on the full pages, so they only read the smallest one
+        for chunk_size in (7, 100, 4096) if filename == smallest else (4096,):
+            assert list(iter_page_records(path, chunk_size)) == json_records(path), (filename, chunk_size)
+
+
+def crn_sets(units):
+    return sorted(tuple(section.crn for section in unit.sections) for unit in units)
+
+
+def test_lectures_are_paired_with_the_labs_of_their_link_set(make_section):
+    sections = [make_section(1, link_identifier='A1'), make_section(2, link_identifier='A1'),
+                make_section(3, link_identifier='B1', meetings=(('T', '1400', '1650'),), credits=1),
+                make_section(4, link_identifier='A2', meetings=(('TR', '0930', '1045'),)),
+                make_section(5, link_identifier='B2', meetings=(('R', '1400', '1650'),), credits=1),
+                make_section(6)]
+    units = bundle_sections(sections)
+    assert crn_sets(units) == [('1', '3'), ('2', '3'), ('4', '5'), ('6',)]
+    bundle = next(unit for unit in units if isinstance(unit, SectionBundle) and unit.sections[0].crn == '4')
+    assert bundle.credits == 4
+    assert bundle.slots == sections[3].slots | sections[4].slots
+
+
+def test_conflicting_pairs_are_dropped(make_section):
+    sections = [make_section(1, link_identifier='A1'),
+                make_section(2, link_identifier='B1', meetings=(('F', '0900', '1150'),)),
+                make_section(3, link_identifier='B1', meetings=(('F', '1200', '1450'),))]
+    assert crn_sets(bundle_sections(sections)) == [('1', '3')]
+
+
+def test_link_set_with_a_single_component_keeps_its_sections(make_section):
+    sections = [make_section(1, link_identifier='A1'), make_section(2, link_identifier='A1'),
+                make_section(3, link_identifier='B2')]
+    assert crn_sets(bundle_sections(sections)) == [('1',), ('2',), ('3',)]
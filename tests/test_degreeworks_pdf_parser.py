@@ -0,0 +1,52 @@
+import pdfplumber
+import pytest
+
+import degreeworks_pdf_parser
+from conftest import make_pdf
+from degreeworks_pdf_parser import iter_page_scans, parse_degreeworks_pdf
+
+AUDIT = [
+    ['Major in Computer Science INCOMPLETE', 'Still needed: 1 Class in ITSC 1212'],
+    ['Degree Works page 2', 'Still needed:'],
+    ['1 Class in ITSC 2214', 'Still needed: 2 Classes in MATH 1241 or MATH 1242'],
+    ['Degree Works page 4', 'Still needed: 1 Class in STAT 1220'],
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_requirement_cut_off_by_a_page_break_is_completed_from_the_next_page():
+    result = parse_degreeworks_pdf(make_pdf(AUDIT))
+    assert result['still_needed_courses'] == [
+        'ITSC1212', 'ITSC2214', {'type': 'options', 'num_to_pick': 2, 'courses': ['MATH1241', 'MATH1242']},
+        'STAT1220']
+    assert 'Degree Works page 2' in result['full_text']
+
+
+def test_complete_last_line_is_not_joined_to_the_next_page():
+    scans = list(iter_page_scans(make_pdf([['Still needed: 1 Class in ITSC 1212'], ['ITSC 3155 elective']])))
+    assert [matches for _, matches in scans] == [['1 Class in ITSC 1212'], []]
+
+
+def test_requirement_without_a_course_is_not_joined_to_the_next_page():
+    result = parse_degreeworks_pdf(make_pdf([
+        ['Degree in Computer Science', 'Still needed: 120 credit hours are required. You currently have 90'],
+        ['ITSC 3155 Software Engineering A 3 Fall 2024', 'Still needed: 1 Class in ITSC 2214']]))
+    assert result['still_needed_courses'] == ['120 credit hours are required. You currently have 90', 'ITSC2214']
+
+
+def test_pool_scans_give_the_in_process_result():
+    pages = AUDIT * 3
+    pdf = make_pdf(pages)
+    assert len(pages) >= degreeworks_pdf_parser.PARALLEL_MIN_PAGES
+    assert list(iter_page_scans(pdf, workers=2)) == list(iter_page_scans(pdf, workers=1))
+
+
+def test_older_pdfplumber_without_simple_text(monkeypatch):
+    monkeypatch.delattr(pdfplumber.page.Page, 'extract_text_simple')
+    matches = [match for _, page_matches in iter_page_scans(make_pdf(AUDIT), workers=1) for match in page_matches]
+    assert matches == ['1 Class in ITSC 1212', '1 Class in ITSC 2214', '2 Classes in MATH 1241 or MATH 1242',
+                       '1 Class in STAT 1220']
@@ -0,0 +1,42 @@
+import pytest
+
+import parallel_solver
+from conftest import random_catalog
+from parallel_solver import parallel_rank_nearest_schedules, parallel_rank_schedules
+from schedule_solver import rank_nearest_schedules, rank_schedules
+
+
+def crns(schedules):
+    return [[section.crn for section in schedule] for schedule in schedules]
+
+
+@pytest.mark.parametrize('seed', range(15))
+@pytest.mark.parametrize('desired_credits', (9, 12))
+def test_parallel_ranking_matches_the_serial_search(seed, desired_credits):
+    catalog = random_catalog(seed, courses=7)
+    course_groups = [list(sections) for sections in catalog.courses['ITSC'].values()]
+    serial = rank_nearest_schedules(course_groups, desired_credits, 3, 5, budget=None)
+    parallel = parallel_rank_nearest_schedules(course_groups, desired_credits, 3, 5, workers=2)
+    assert crns(parallel) == crns(serial)
+
+
+def test_parallel_window_matches_the_serial_search():
+    course_groups = [list(sections) for sections in random_catalog(3, courses=7).courses['ITSC'].values()]
+    assert (crns(parallel_rank_schedules(course_groups, 7, 12, 6, workers=2, split_depth=3))
+            == crns(rank_schedules(course_groups, 7, 12, 6, budget=None)))
+
+
+def test_one_pool_serves_every_credit_band(monkeypatch):
+    pools = []
+
+    class CountingPool(parallel_solver.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr(parallel_solver, 'ProcessPoolExecutor', CountingPool)
+    course_groups = [list(sections) for sections in random_catalog(0, courses=5).courses['ITSC'].values()]
+    # More schedules than any one band holds, so several bands are ranked
+    ranked = parallel_rank_nearest_schedules(course_groups, 9, 3, 100, workers=2)
+    assert len(pools) == 1
+    assert len({sum(section.credits for section in schedule) for schedule in ranked}) > 1
+    assert crns(ranked) == crns(rank_nearest_schedules(course_groups, 9, 3, 100, budget=None))
@@ -0,0 +1,24 @@
+import os
+
+import parse_cache
+from parse_cache import cache_key, load_cached, store_cached
+
+
+def test_key_changes_with_the_parser_version(monkeypatch):
+    key = cache_key(b'%PDF-1.4 audit')
+    assert key == cache_key(b'%PDF-1.4 audit')
+    monkeypatch.setattr(parse_cache, 'PARSER_VERSION', parse_cache.PARSER_VERSION + 1)
+    assert cache_key(b'%PDF-1.4 audit') != key
+
+
+def test_entries_round_trip_and_the_least_recently_used_is_evicted(tmp_path):
+    directory = str(tmp_path)
+    result = {'full_text': 'x' * 100, 'still_needed_courses': ['ITSC1212']}
+    for index, key in enumerate(('a', 'b', 'c')):
+        store_cached(key, result, directory)
+        os.utime(os.path.join(directory, f"{key}.json"), ns=(index * 10 ** 9, index * 10 ** 9))
+    assert load_cached('a', directory) == result
+    entry_bytes = os.path.getsize(os.path.join(directory, 'a.json'))
+    store_cached('d', result, directory, max_bytes=3 * entry_bytes)
+    assert load_cached('b', directory) is None
+    assert all(load_cached(key, directory) == result for key in ('a', 'c', 'd'))
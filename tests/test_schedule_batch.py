@@ -0,0 +1,30 @@
+import pytest
+
+from schedule_batch import ScheduleBatch, stress_levels
+from schedule_metrics import calculate_stress_level
+
+
+@pytest.fixture
+def schedules(make_section):
+    sections = [
+        make_section(1, meetings=[('MWF', '0900', '0950')]),
+        make_section(2, number='2214', meetings=[('M', '0900', '1200'), ('MTWR', '1800', '2200')], credits=4),
+        make_section(3, number='2215', meetings=[('', None, None), ('TR', '1300', '1415')]),
+        make_section(4, number='2216', meetings=[('', None, None)], credits=1),
+    ]
+    return [[sections[0]], [sections[0], sections[1]], [sections[1], sections[2], sections[3]], []]
+
+
+@pytest.mark.parametrize('view_type', ['week', 'month'])
+def test_batch_matches_single_schedule_metrics(schedules, view_type):
+    expected = [min(calculate_stress_level(schedule, view_type), 100) for schedule in schedules]
+    assert stress_levels(schedules, view_type) == pytest.approx(expected)
+
+
+def test_later_meetings_change_batch_stress(make_section):
+    plain = make_section(1, meetings=[('M', '0900', '1200')], credits=9)
+    with_evening = make_section(2, meetings=[('M', '0900', '1200'), ('MTWR', '1800', '2200')], credits=9)
+    batch = ScheduleBatch([plain, with_evening])
+    levels = batch.stress_levels(batch.indices([[plain], [with_evening]]))
+    assert levels[1] > levels[0]
+    assert list(batch.rank(batch.indices([[with_evening], [plain]]))) == [1, 0]
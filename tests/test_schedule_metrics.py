@@ -0,0 +1,28 @@
+from schedule_metrics import StressScore, analyze_schedule_distribution, block_hours, calculate_stress_level
+
+
+def test_every_meeting_counts_towards_days_and_blocks(make_section):
+    section = make_section(1, meetings=[('M', '0900', '1000'), ('TR', '1900', '2000')])
+    assert section.days == 'MTR'
+    assert block_hours(section) == [1, 0, 1]
+    analysis = analyze_schedule_distribution([section])
+    assert dict(analysis['daily_load']) == {'M': 3, 'T': 3, 'R': 3}
+    assert dict(analysis['time_blocks']) == {'morning': 1, 'evening': 1}
+    assert analysis['total_hours'] == 3
+
+
+def test_later_meetings_change_stress(make_section):
+    first_only = make_section(1, meetings=[('M', '0900', '1200')])
+    with_evening = make_section(2, meetings=[('M', '0900', '1200'), ('MTWR', '1800', '2200')], credits=9)
+    plain = make_section(3, meetings=[('M', '0900', '1200')], credits=9)
+    assert calculate_stress_level([with_evening]) > calculate_stress_level([plain])
+    assert StressScore()([with_evening]) > StressScore()([plain])
+    assert StressScore().equivalence_key(with_evening) != StressScore().equivalence_key(plain)
+    assert calculate_stress_level([first_only]) == StressScore()([first_only])
+
+
+def test_untimed_first_meeting_does_not_hide_a_timed_one(make_section):
+    section = make_section(1, meetings=[('', None, None), ('TR', '1300', '1415')])
+    assert section.slots
+    assert (section.begin_time, section.end_time, section.days) == ('1300', '1415', 'TR')
+    assert block_hours(section) == [0, 1, 0]
@@ -0,0 +1,46 @@
+import pytest
+
+from course_scheduler import SchedulePager
+
+
+class FlakySource:
+    """Yields 0, 1, 2, ... up to total, raising once when it reaches fail_at"""
+
+    def __init__(self, total, fail_at):
+        self.total = total
+        self.fail_at = fail_at
+        self.position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position == self.fail_at:
+            self.fail_at = None
+            raise ConnectionError("service went away")
+        if self.position >= self.total:
+            raise StopIteration
+        self.position += 1
+        return [self.position - 1]
+
+
+def test_an_error_propagates_and_the_page_is_retried():
+    pager = SchedulePager(FlakySource(10, fail_at=6), page_size=4)
+    assert pager.next_page() == [[0], [1], [2], [3]]
+    with pytest.raises(ConnectionError):
+        pager.next_page()
+    assert not pager.exhausted and pager.page_number == 1
+    assert pager.next_page() == [[4], [5], [6], [7]]
+    assert pager.next_page() == [[8], [9]]
+    assert pager.exhausted
+
+
+@pytest.mark.parametrize('total', [0, 3, 4, 8, 9])
+def test_last_page_is_known_without_an_empty_page(total):
+    pager = SchedulePager(iter([[number] for number in range(total)]), page_size=4)
+    pages = [pager.next_page()]
+    while not pager.exhausted:
+        pages.append(pager.next_page())
+    assert all(pages) or total == 0
+    assert [schedule for page in pages for schedule in page] == [[number] for number in range(total)]
+    assert len(pages) == max(1, -(-total // 4))
@@ -0,0 +1,106 @@
+import itertools
+
+import pytest
+
+from conftest import random_catalog
+from schedule_metrics import StressScore
+from schedule_solver import ConflictMatrix, SearchPlan, courses_overlap, rank_schedules
+
+
+def all_sections(catalog):
+    return [section for numbers in catalog.courses.values() for sections in numbers.values() for section in sections]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_conflict_matrix_agrees_with_courses_overlap(seed):
+    sections = all_sections(random_catalog(seed, courses=8))
+    matrix = ConflictMatrix(sections)
+    for section1, section2 in itertools.product(sections, repeat=2):
+        if section1 is not section2:
+            assert matrix.conflicts(section1, section2) == courses_overlap(section1, section2)
+
+
+def brute_force_scores(course_groups, min_credits, max_credits, score, requirements=()):
+    """Scores of every conflict-free schedule of at most one section per course, one per timetable,
+    taking at most N courses of every "choose N of" requirement"""
+    by_key = {}
+    for choice in itertools.product(*[[None] + list(group) for group in course_groups]):
+        if any(sum(choice[index] is not None for index in indices) > limit for indices, limit in requirements):
+            continue
+        schedule = [section for section in choice if section is not None]
+        if not min_credits <= sum(section.credits for section in schedule) <= max_credits:
+            continue
+        if any(courses_overlap(a, b) for a, b in itertools.combinations(schedule, 2)):
+            continue
+        key = frozenset((section.course_number, score.equivalence_key(section)) for section in schedule)
+        by_key[key] = score(schedule)
+    return sorted(by_key.values())
+
+
+# "Choose N of" groups over the six courses of random_catalog: one cap, overlapping caps (course 2 counts
+# against both), a cap of two and one that can never be exceeded
+REQUIREMENT_SETS = [(), [((0, 1, 2), 1)], [((0, 1, 2), 1), ((2, 3, 4), 2)], [((1, 2, 3, 4, 5), 2)],
+                    [((0, 5), 2)]]
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('k', (1, 3, 10))
+@pytest.mark.parametrize('requirements', REQUIREMENT_SETS)
+def test_rank_schedules_matches_brute_force(seed, k, requirements):
+    catalog = random_catalog(seed, courses=6)
+    course_groups = [list(sections) for sections in catalog.courses['ITSC'].values()]
+    score = StressScore()
+    for min_credits, max_credits in ((6, 6), (7, 10), (9, 13)):
+        ranked = rank_schedules(course_groups, min_credits, max_credits, k, score, requirements=requirements)
+        expected = brute_force_scores(course_groups, min_credits, max_credits, score, requirements)[:k]
+        assert [score(schedule) for schedule in ranked] == pytest.approx(expected)
+        for schedule in ranked:
+            assert not any(courses_overlap(a, b) for a, b in itertools.combinations(schedule, 2))
+            assert len({section.course_number for section in schedule}) == len(schedule)
+            taken = {int(section.course_number) - 1000 for section in schedule}
+            assert all(len(taken & set(indices)) <= limit for indices, limit in requirements)
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('requirements', REQUIREMENT_SETS)
+def test_reachable_credits_are_never_underestimated(seed, requirements):
+    catalog = random_catalog(seed, courses=6)
+    plan = SearchPlan([list(sections) for sections in catalog.courses['ITSC'].values()], requirements=requirements)
+    most = [max(plan.credits_of[i] for i in group) for group in plan.groups]
+    for start in range(len(plan.groups) + 1):
+        # The most credits any capped pick of courses from groups[start:] can add, conflicts aside
+        best = 0
+        for taken in itertools.product((False, True), repeat=len(plan.groups) - start):
+            counts = [0] * len(plan.limits)
+            for offset, take in enumerate(taken):
+                for r in plan.requirements_of[start + offset] if take else ():
+                    counts[r] += 1
+            if all(count <= limit for count, limit in zip(counts, plan.limits)):
+                best = max(best, sum(most[start + offset] for offset, take in enumerate(taken) if take))
+        assert plan.reachable[start] >= best
+
+
+class CountingScore(StressScore):
+    def __init__(self):
+        super().__init__()
+        self.bounds = 0
+
+    def bound(self, partial, min_credits):
+        # Scores are bounds with min_credits 0; only the search's pruning bounds are counted
+        self.bounds += min_credits > 0
+        return super().bound(partial, min_credits)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_budget_keeps_the_best_found_so_far(seed):
+    catalog = random_catalog(seed, courses=8)
+    course_groups = [list(sections) for sections in catalog.courses['ITSC'].values()]
+    exact = rank_schedules(course_groups, 7, 12, 4, budget=None)
+    score = CountingScore()
+    cut = rank_schedules(course_groups, 7, 12, 4, score, budget=10)
+    assert score.bounds == 10
+    assert len(cut) <= len(exact)
+    for schedule, best in zip(cut, exact):
+        assert 7 <= sum(section.credits for section in schedule) <= 12
+        assert not any(courses_overlap(a, b) for a, b in itertools.combinations(schedule, 2))
+        assert score(schedule) >= score(best) - 1e-9
@@ -0,0 +1,83 @@
+import io
+import urllib.error
+import urllib.request
+
+import pytest
+
+import scheduling_client
+from course_scheduler import SchedulePager
+from tracing import start_trace, stop_trace
+
+
+def test_failed_page_is_fetched_again_from_the_same_offset(monkeypatch):
+    offsets = []
+    failures = [scheduling_client.ServiceError("service restarting")]
+
+    def fetch_schedules(still_needed, desired_credits, offset, limit, request_id, **options):
+        offsets.append(offset)
+        if offset == 4 and failures:
+            raise failures.pop()
+        schedules = [[number] for number in range(offset, min(offset + limit, 5))]
+        return {'schedules': schedules, 'exhausted': offset + limit >= 5}
+    monkeypatch.setattr(scheduling_client, 'fetch_schedules', fetch_schedules)
+    monkeypatch.setattr(scheduling_client, 'cancel', lambda request_id: False)
+
+    pager = SchedulePager(scheduling_client.iter_schedules(['ITSC1212'], 12, page_size=2), page_size=2)
+    assert pager.next_page() == [[0], [1]]
+    with pytest.raises(scheduling_client.ServiceError):
+        pager.next_page()
+    assert not pager.exhausted
+    assert pager.next_page() == [[2], [3]]
+    assert pager.next_page() == [[4]]
+    assert pager.exhausted
+    assert offsets == [0, 2, 4, 4]
+
+
+@pytest.mark.parametrize('body, reason', [(b'{"error": "CRN 1 is gone", "reason": "unknown_crn"}', 'unknown_crn'),
+                                          (b'{"error": "limit must be an integer"}', None),
+                                          (b'<html>Bad Gateway</html>', None)])
+def test_rejection_reason_is_kept(monkeypatch, body, reason):
+    def urlopen(request, timeout):
+        raise urllib.error.HTTPError(request.full_url, 400, 'Bad Request', {}, io.BytesIO(body))
+    monkeypatch.setattr(urllib.request, 'urlopen', urlopen)
+    with pytest.raises(scheduling_client.ServiceError) as failure:
+        scheduling_client.fetch_schedules(['ITSC1212'], 12)
+    assert failure.value.reason == reason
+
+
+def test_unreachable_service_has_no_reason(monkeypatch):
+    def urlopen(request, timeout):
+        raise urllib.error.URLError(ConnectionRefusedError(111, 'Connection refused'))
+    monkeypatch.setattr(urllib.request, 'urlopen', urlopen)
+    with pytest.raises(scheduling_client.ServiceError, match='not reachable') as failure:
+        scheduling_client.health()
+    assert failure.value.reason is None
+
+
+def test_traced_call_adds_the_service_spans(monkeypatch):
+    payloads = []
+
+    def request(path, payload, timeout):
+        payloads.append(payload)
+        return {'cancelled': True, 'spans': [{'span': 'solve', 'parent': 'service_request', 'ms': 1.0}]}
+    monkeypatch.setattr(scheduling_client, '_request', request)
+    records = start_trace()
+    try:
+        assert scheduling_client.cancel('abc')
+    finally:
+        stop_trace()
+    assert payloads == [{'request_id': 'abc', 'trace': True}]
+    assert [record['span'] for record in records] == ['solve', 'service_call']
+    assert scheduling_client.cancel('abc') and payloads[-1] == {'request_id': 'abc'}
+
+
+def test_found_sections_are_rebuilt_as_courses(monkeypatch, make_section):
+    payloads = []
+
+    def request(path, payload, timeout):
+        payloads.append((path, payload))
+        return {'term': '202510', 'sections': [make_section(1234).to_json()], 'truncated': False}
+    monkeypatch.setattr(scheduling_client, '_request', request)
+    found = scheduling_client.find_sections('202510', crn='1234')
+    assert payloads == [('/sections', {'crn': '1234', 'term': '202510'})]
+    assert [(section.crn, section.subject, section.days) for section in found] == [('1234', 'ITSC', 'MWF')]
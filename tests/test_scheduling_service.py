@@ -0,0 +1,201 @@
+import asyncio
+import base64
+import json
+import threading
+from http import HTTPStatus
+
+import pytest
+
+import schedule_solver
+import scheduling_service
+from conftest import random_catalog
+from schedule_solver import SearchCancelled
+from scheduling_service import SchedulingService
+
+
+@pytest.fixture
+def service():
+    service = SchedulingService(random_catalog(0), concurrency=2)
+    yield service
+    service.close()
+
+
+def respond(service, method, path, body=b''):
+    return asyncio.run(service._respond(method, path, body))
+
+
+@pytest.mark.parametrize('still_needed', [
+    'ITSC1000', ['ITSC1000', 7], [{'courses': ['ITSC1000']}], [{'type': 'options', 'courses': 'ITSC1000'}],
+    [{'type': 'options', 'courses': ['ITSC1000'], 'num_to_pick': 'one'}],
+    [{'type': 'options', 'courses': ['ITSC1000'], 'num_to_pick': 0}],
+])
+def test_malformed_still_needed_is_a_bad_request(service, still_needed):
+    body = json.dumps({'desired_credits': 6, 'still_needed': still_needed}).encode()
+    status, result = respond(service, 'POST', '/schedules', body)
+    assert status == HTTPStatus.BAD_REQUEST
+    assert 'still_needed' in result['error']
+
+
+def test_unknown_locked_crn_is_marked_for_the_client(service):
+    body = json.dumps({'desired_credits': 6, 'still_needed': ['ITSC1000'], 'locked': ['99999']}).encode()
+    status, result = respond(service, 'POST', '/schedules', body)
+    assert status == HTTPStatus.BAD_REQUEST and result['reason'] == 'unknown_crn'
+    status, result = respond(service, 'POST', '/schedules', b'{"desired_credits": 0, "still_needed": []}')
+    assert status == HTTPStatus.BAD_REQUEST and 'reason' not in result
+
+
+def test_traced_request_returns_its_spans(service):
+    body = {'desired_credits': 6, 'still_needed': ['ITSC1000', 'ITSC1001']}
+    status, result = respond(service, 'POST', '/schedules', json.dumps(dict(body, trace=True)).encode())
+    assert status == HTTPStatus.OK
+    names = {record['span'] for record in result['spans']}
+    assert {'section_resolve', 'solve'} <= names
+    assert 'spans' not in respond(service, 'POST', '/schedules', json.dumps(body).encode())[1]
+
+
+def test_sections_are_queried_from_the_catalog(service):
+    expected = [section.crn for section in service.catalog.query(subject='ITSC', during=('MWF', 540, 600))]
+    status, result = respond(service, 'POST', '/sections',
+                             b'{"subject": "ITSC", "during": ["MWF", 540, 600], "limit": 50}')
+    assert status == HTTPStatus.OK and expected
+    assert [section['crn'] for section in result['sections']] == expected and not result['truncated']
+    status, result = respond(service, 'POST', '/sections', b'{"limit": 1}')
+    assert len(result['sections']) == 1 and result['truncated']
+
+
+@pytest.mark.parametrize('body', [b'{"room": "101"}', b'{"crn": 5}', b'{"during": ["MWF", 540]}',
+                                  b'{"term": "190010"}'])
+def test_bad_section_queries_are_answered_with_400(service, body):
+    assert respond(service, 'POST', '/sections', body)[0] == HTTPStatus.BAD_REQUEST
+
+
+def test_unreadable_pdf_is_a_bad_request(service, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    body = b'{"pdf_base64": "%s"}' % base64.b64encode(b'not a pdf')
+    status, result = respond(service, 'POST', '/still-needed', body)
+    assert status == HTTPStatus.BAD_REQUEST
+    assert 'not a readable PDF' in result['error']
+
+
+def test_unexpected_failure_is_answered_with_500(service, monkeypatch):
+    def fail(payload):
+        raise KeyError('broken')
+    monkeypatch.setattr(service, '_schedules', fail)
+    status, result = respond(service, 'POST', '/schedules', b'{"desired_credits": 6}')
+    assert status == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert result == {'error': "the service failed: KeyError"}
+
+
+async def request(port, method, path, body=b'', content_length=None):
+    """Send one HTTP request and read (status, JSON body) back"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    length = len(body) if content_length is None else content_length
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {length}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(data)
+
+
+def serving(service, client):
+    """Run client(port) against the service listening on an ephemeral port"""
+    async def run():
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        async with server:
+            return await client(server.sockets[0].getsockname()[1])
+    return asyncio.run(run())
+
+
+def slow_solve(started, stopped):
+    """A stand-in for _schedules that runs until its search is cancelled"""
+    def solve(payload):
+        started.set()
+        cancel = schedule_solver._cancel_event.get()
+        while not cancel.wait(0.01):
+            pass
+        stopped.set()
+        raise SearchCancelled()
+    return solve
+
+
+def test_health_and_unknown_routes(service):
+    async def client(port):
+        return (await request(port, 'GET', '/health'), await request(port, 'GET', '/schedules'),
+                await request(port, 'POST', '/nowhere', b'{}'))
+    (status, health), (get_status, _), (post_status, _) = serving(service, client)
+    assert status == HTTPStatus.OK
+    assert (health['sections'], health['catalog_version']) == (len(service.catalog), service.catalog.version)
+    assert get_status == post_status == HTTPStatus.NOT_FOUND
+
+
+def test_schedules_are_paged(service):
+    still_needed = [f"ITSC{number}" for number in service.catalog.courses['ITSC']]
+
+    async def client(port):
+        pages = []
+        for offset in (0, 2):
+            body = json.dumps({'still_needed': still_needed, 'desired_credits': 9, 'offset': offset, 'limit': 2})
+            pages.append(await request(port, 'POST', '/schedules', body.encode()))
+        return pages
+    pages = serving(service, client)
+    assert [status for status, _ in pages] == [HTTPStatus.OK, HTTPStatus.OK]
+    first, second = (result for _, result in pages)
+    assert first['offset'] == 0 and second['offset'] == 2
+    assert len(first['schedules']) == 2 and not first['exhausted']
+    crns = [[section['crn'] for section in schedule] for schedule in first['schedules'] + second['schedules']]
+    assert len({tuple(sorted(schedule)) for schedule in crns}) == len(crns)
+
+
+@pytest.mark.parametrize('body', [b'{not json', b'[1, 2]', b'{"desired_credits": 0, "still_needed": []}',
+                                  b'{"desired_credits": 9, "still_needed": [], "term": "190010"}',
+                                  b'{"desired_credits": 9, "still_needed": [], "locked": "123"}',
+                                  b'{"desired_credits": 9, "still_needed": [], "timeout": -1}'])
+def test_bad_requests_are_answered_with_400(service, body):
+    status, result = serving(service, lambda port: request(port, 'POST', '/schedules', body))
+    assert status == HTTPStatus.BAD_REQUEST and result['error']
+
+
+def test_oversized_body_is_refused_unread(service, monkeypatch):
+    monkeypatch.setattr(scheduling_service, 'MAX_BODY_BYTES', 16)
+    status, result = serving(service, lambda port: request(port, 'POST', '/schedules', b'{}', content_length=17))
+    assert status == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+
+def test_timeout_cancels_the_search(service, monkeypatch):
+    started, stopped = threading.Event(), threading.Event()
+    monkeypatch.setattr(service, '_schedules', slow_solve(started, stopped))
+    status, _ = serving(service, lambda port: request(port, 'POST', '/schedules', b'{"timeout": 0.1}'))
+    assert status == HTTPStatus.GATEWAY_TIMEOUT
+    assert started.is_set() and stopped.wait(5)
+
+
+def test_cancel_stops_the_named_request(service, monkeypatch):
+    started, stopped = threading.Event(), threading.Event()
+    monkeypatch.setattr(service, '_schedules', slow_solve(started, stopped))
+
+    async def client(port):
+        solve = asyncio.ensure_future(request(port, 'POST', '/schedules', b'{"request_id": "abc"}'))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        cancelled = await request(port, 'POST', '/cancel', b'{"request_id": "abc"}')
+        unknown = await request(port, 'POST', '/cancel', b'{"request_id": "xyz"}')
+        return await solve, cancelled, unknown
+    (status, _), cancelled, unknown = serving(service, client)
+    assert status == HTTPStatus.CONFLICT
+    assert cancelled == (HTTPStatus.OK, {'cancelled': True})
+    assert unknown == (HTTPStatus.OK, {'cancelled': False})
+    assert stopped.is_set() and not service._cancel_events
+
+
+def test_hang_up_cancels_the_search(service, monkeypatch):
+    started, stopped = threading.Event(), threading.Event()
+    monkeypatch.setattr(service, '_schedules', slow_solve(started, stopped))
+
+    async def client(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'POST /schedules HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}')
+        await writer.drain()
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        writer.close()
+        return await asyncio.get_running_loop().run_in_executor(None, stopped.wait, 5)
+    assert serving(service, client)
@@ -0,0 +1,81 @@
+import pytest
+
+from catalog import Catalog
+from conftest import random_catalog
+from course_scheduler import CourseScheduler, SolveSession
+from schedule_metrics import StressScore
+from schedule_solver import credit_bands
+
+DESIRED_CREDITS = 10
+
+
+def expected_scores(catalog, still_needed, locked, excluded, k=4):
+    """Scores of the k best schedules, found by listing every schedule of a scheduler over a filtered catalog"""
+    locked_sections = [catalog.section(crn) for crn in locked]
+    locked_codes = {section.subject + section.course_number for section in locked_sections}
+    course_data = {}
+    for subject, numbers in catalog.courses.items():
+        for number, sections in numbers.items():
+            code = subject + number
+            if code in excluded:
+                continue
+            if code in locked_codes:
+                sections = [section for section in sections if section.crn in locked]
+            course_data.setdefault(subject, {})[number] = list(sections)
+    still_needed = [code for code in still_needed if code not in excluded]
+    scheduler = CourseScheduler(None, Catalog(course_data), still_needed_courses=still_needed)
+    score = StressScore()
+    schedules = [schedule for schedule in scheduler.iter_schedules(DESIRED_CREDITS, ranked_first=0)
+                 if locked_codes <= {section.subject + section.course_number for section in schedule}]
+    scores = []
+    for credits in credit_bands(DESIRED_CREDITS, CourseScheduler.CREDIT_TOLERANCE):
+        # Equivalent schedules are one schedule to the ranked search
+        by_key = {frozenset((section.subject + section.course_number, score.equivalence_key(section))
+                            for section in schedule): score(schedule)
+                  for schedule in schedules if sum(section.credits for section in schedule) == credits}
+        scores += sorted(by_key.values())
+        if len(scores) >= k:
+            break
+    return scores[:k]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_session_matches_fresh_solves_through_tighten_and_relax(seed, monkeypatch):
+    catalog = random_catalog(seed)
+    still_needed = [subject + number for subject, numbers in catalog.courses.items() for number in numbers]
+    scheduler = CourseScheduler(None, catalog, still_needed_courses=still_needed)
+    session = scheduler.session(DESIRED_CREDITS)
+    first = catalog.sections('ITSC', '1000')[0].crn
+    second = catalog.sections('ITSC', '1001')[0].crn
+    seeded = []
+    seed_bound = SolveSession._seed_bound
+
+    def recording_seed_bound(self, constraints, credits, k):
+        bound = seed_bound(self, constraints, credits, k)
+        seeded.append(bound != float('inf'))
+        return bound
+    monkeypatch.setattr(SolveSession, '_seed_bound', recording_seed_bound)
+
+    # Tighten step by step, then relax back through the same constraints
+    steps = [((), ()), ((first,), ()), ((first,), ('ITSC1002',)), ((first, second), ('ITSC1002',)),
+             ((first,), ('ITSC1002',)), ((), ('ITSC1002',)), ((), ())]
+    for locked, excluded in steps:
+        got = session.generate_schedules(locked=locked, excluded=excluded)
+        fresh = scheduler.session(DESIRED_CREDITS).generate_schedules(locked=locked, excluded=excluded)
+        assert [[section.crn for section in schedule] for schedule in got] == \
+            [[section.crn for section in schedule] for schedule in fresh]
+        assert [StressScore()(schedule) for schedule in got] == \
+            pytest.approx(expected_scores(catalog, still_needed, locked, excluded))
+        for schedule in got:
+            assert set(locked) <= {section.crn for section in schedule}
+            assert not {section.subject + section.course_number for section in schedule} & set(excluded)
+    # Relaxing reuses the rankings kept while tightening as a starting bound
+    assert any(seeded)
+
+
+def test_locking_a_section_of_an_excluded_course_is_rejected():
+    catalog = random_catalog(0)
+    session = CourseScheduler(None, catalog, still_needed_courses=['ITSC1000', 'ITSC1001']).session(6)
+    crn = catalog.sections('ITSC', '1000')[0].crn
+    with pytest.raises(ValueError):
+        session.generate_schedules(locked=[crn], excluded=['ITSC1000'])
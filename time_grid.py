@@ -0,0 +1,23 @@
+# The week is a fixed-width bitset of 5-minute slots, day after day in
+# data_preprocessing.DAY_BITS order (M, T, W, R, F, S, U). A section's
+# occupancy is encoded once at ingest; a partial schedule is the OR of its
+# sections, and testing a candidate against it is a single AND.
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+DAYS_PER_WEEK = 7
+WEEK_SLOTS = SLOTS_PER_DAY * DAYS_PER_WEEK
+
+
+def occupancy(day_mask: int, begin_minutes: int, end_minutes: int) -> int:
+    """Bitset of the slots covered by [begin_minutes, end_minutes) on every day in day_mask"""
+    if not day_mask or end_minutes <= begin_minutes:
+        return 0
+    # Round outward so a meeting that only touches part of a slot still owns it
+    first = begin_minutes // SLOT_MINUTES
+    last = -(-end_minutes // SLOT_MINUTES)
+    day = ((1 << (last - first)) - 1) << first
+    mask = 0
+    for index in range(DAYS_PER_WEEK):
+        if day_mask & (1 << index):
+            mask |= day << (index * SLOTS_PER_DAY)
+    return mask
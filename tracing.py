@@ -0,0 +1,130 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Every module logs here; with no handler configured only warnings reach stderr
+logger = logging.getLogger('course_scheduler')
+
+# Spans are recorded while tracing is on (COURSE_SCHEDULER_TRACE=1, or configure())
+# and, for one request, after start_trace()
+_enabled = os.environ.get('COURSE_SCHEDULER_TRACE', '') not in ('', '0')
+_json_log_path: Optional[str] = os.environ.get('COURSE_SCHEDULER_TRACE_LOG')
+_json_lock = threading.Lock()
+
+# Per request (a Streamlit rerun runs in its own context): the records collected so far and the open span
+_trace: contextvars.ContextVar[Optional[List[Dict]]] = contextvars.ContextVar('trace', default=None)
+_current: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('span', default=None)
+
+
+def configure(enabled: bool, json_log: Optional[str] = None, level: Optional[int] = None) -> None:
+    """Turn span recording on or off, optionally appending every span to json_log as a JSON line.
+
+    ``level`` also sets the logger level and gives it a stderr handler, so
+    the debug messages that are normally dropped are printed.
+    """
+    global _enabled, _json_log_path
+    _enabled = enabled
+    _json_log_path = json_log
+    if level is not None:
+        logger.setLevel(level)
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+            logger.addHandler(handler)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def start_trace(records: Optional[List[Dict]] = None) -> List[Dict]:
+    """Record spans in this context, even with tracing off, appending them to records (or a new list)"""
+    if records is None:
+        records = []
+    _trace.set(records)
+    return records
+
+
+def stop_trace() -> None:
+    _trace.set(None)
+
+
+def is_tracing() -> bool:
+    """Whether this context keeps its spans (see start_trace)"""
+    return _trace.get() is not None
+
+
+def add_records(records: List[Dict]) -> None:
+    """Append spans recorded elsewhere, such as in the scheduling service, to this context's trace"""
+    current = _trace.get()
+    if current is not None:
+        current.extend(records)
+
+
+class Span:
+    """A named, timed stage; count() attaches counters such as nodes explored"""
+
+    __slots__ = ('name', 'counts', 'parent', '_start', '_token')
+
+    def __init__(self, name: str, counts: Dict):
+        self.name = name
+        self.counts = counts
+        self.parent = None
+        self._start = 0.0
+        self._token = None
+
+    def count(self, key: str, amount: float = 1) -> None:
+        self.counts[key] = self.counts.get(key, 0) + amount
+
+    def __enter__(self) -> 'Span':
+        parent = _current.get()
+        self.parent = parent.name if parent is not None else None
+        self._token = _current.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        milliseconds = (time.perf_counter() - self._start) * 1000
+        _current.reset(self._token)
+        record = {'span': self.name, 'parent': self.parent, 'ms': round(milliseconds, 3), **self.counts}
+        records = _trace.get()
+        if records is not None:
+            records.append(record)
+        logger.debug("span %s", record)
+        if _json_log_path:
+            line = json.dumps({'time': time.time(), **record}, default=str)
+            with _json_lock, open(_json_log_path, 'a') as file:
+                file.write(line + '\n')
+
+
+class _NullSpan:
+    """Stands in for Span while tracing is off, so instrumented code costs next to nothing"""
+
+    __slots__ = ()
+
+    def count(self, key: str, amount: float = 1) -> None:
+        pass
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **counts):
+    """Time the enclosed stage as a span named name, starting from the given counters"""
+    return Span(name, counts) if _enabled or _trace.get() is not None else _NULL_SPAN
+
+
+def current_span():
+    """The innermost open span of this context, or a no-op span"""
+    current = _current.get()
+    return current if current is not None else _NULL_SPAN